@@ -0,0 +1,180 @@
+from errors import *
+from enigma_helpers import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAXIMUM_NUMBER_OF_ROTORS = 4
+IDENTITY_WIRING = tuple(range(26))
+DEFAULT_BATCH_SIZE = 4096
+
+
+def is_batched_engine_available():
+    return np is not None
+
+
+class BatchedEnigmaEngine:
+    """
+    Encodes a string with a whole batch of enigma machines at once using NumPy
+
+    Rather than sending a string through one enigma machine at a time, the settings
+    of every enigma machine in the batch are turned into integer arrays (one row per
+    enigma machine):
+
+    wirings: (batch, rotor, 26), the internal wiring of each rotor
+    inverse_wirings: (batch, rotor, 26), the internal wiring from left to right
+    ring_settings, positions, notches: (batch, rotor)
+    reflectors: (batch, 26)
+    plugboards: (batch, 26)
+
+    Each character of the string is then sent through every enigma machine in the
+    batch with a handful of NumPy operations. Enigma machines with three rotors
+    are given a fourth rotor with straight through wiring, so enigma machines with
+    three and four rotors can be mixed in the same batch
+    """
+
+    def __init__(self, enigma_machines):
+        if np is None:
+            raise BatchedEnigmaEngineError(
+                "NumPy must be installed to use the batched enigma engine"
+            )
+
+        if len(enigma_machines) == 0:
+            raise BatchedEnigmaEngineError(
+                "You must provide at least one enigma machine"
+            )
+
+        self.enigma_machines = enigma_machines
+        batch_size = len(enigma_machines)
+
+        # rotors and reflectors with the same wiring share the same row in these
+        # tables, so the per enigma machine arrays are built from indexes into them
+        # rather than from copies of the wiring
+        unique_wirings = {IDENTITY_WIRING: 0}
+        unique_reflectors = {}
+
+        wiring_indexes = np.zeros((batch_size, MAXIMUM_NUMBER_OF_ROTORS), dtype=np.intp)
+        reflector_indexes = np.zeros(batch_size, dtype=np.intp)
+        self.ring_settings = np.zeros(
+            (batch_size, MAXIMUM_NUMBER_OF_ROTORS), dtype=np.int64
+        )
+        self.initial_positions = np.zeros(
+            (batch_size, MAXIMUM_NUMBER_OF_ROTORS), dtype=np.int64
+        )
+        self.notches = np.full(
+            (batch_size, MAXIMUM_NUMBER_OF_ROTORS), -1, dtype=np.int64
+        )
+        self.plugboards = np.zeros((batch_size, 26), dtype=np.int64)
+
+        for i, enigma_machine in enumerate(enigma_machines):
+            rotor_cradle = enigma_machine.rotor_cradle
+
+            for j, rotor in enumerate(rotor_cradle.rotors):
+                wiring = tuple(ord(char) - 65 for char in rotor.mapping)
+                wiring_indexes[i, j] = unique_wirings.setdefault(
+                    wiring, len(unique_wirings)
+                )
+                self.ring_settings[i, j] = rotor.ring_setting
+                self.initial_positions[i, j] = rotor.position
+                self.notches[i, j] = rotor.notch
+
+            reflector = tuple(rotor_cradle.reflector.encode(pin) for pin in range(26))
+            reflector_indexes[i] = unique_reflectors.setdefault(
+                reflector, len(unique_reflectors)
+            )
+
+            self.plugboards[i] = enigma_machine.plugboard.get_pins()
+
+        wiring_table = np.array(list(unique_wirings), dtype=np.int64)
+        inverse_wiring_table = np.argsort(wiring_table, axis=1)
+        reflector_table = np.array(list(unique_reflectors), dtype=np.int64)
+
+        self.wirings = wiring_table[wiring_indexes]
+        self.inverse_wirings = inverse_wiring_table[wiring_indexes]
+        self.reflectors = reflector_table[reflector_indexes]
+
+    def encode(self, string):
+        """
+        Encodes a string with every enigma machine in the batch, returning a
+        (batch, len(string)) array of pins, where 0 is A and 25 is Z
+
+        The enigma machines are not changed, so encoding always starts from the
+        positions the rotors were in when the batch was created
+        """
+        if not is_valid_enigma_input_string(string):
+            raise BatchedEnigmaEngineError(
+                "Input must be uppercase letters of the alphabet only with no spaces"
+            )
+
+        batch_size = len(self.enigma_machines)
+        rows = np.arange(batch_size)
+        positions = self.initial_positions.copy()
+        encoded = np.empty((batch_size, len(string)), dtype=np.int64)
+
+        for i, character in enumerate(string):
+            self.__step_rotors__(positions)
+            offsets = (positions - self.ring_settings) % 26
+
+            signal = self.plugboards[:, ord(character) - 65]
+
+            for j in range(MAXIMUM_NUMBER_OF_ROTORS):
+                adjusted_pin = (signal + offsets[:, j]) % 26
+                signal = (self.wirings[rows, j, adjusted_pin] - offsets[:, j]) % 26
+
+            signal = self.reflectors[rows, signal]
+
+            for j in range(MAXIMUM_NUMBER_OF_ROTORS - 1, -1, -1):
+                adjusted_contact = (signal + offsets[:, j]) % 26
+                signal = (
+                    self.inverse_wirings[rows, j, adjusted_contact] - offsets[:, j]
+                ) % 26
+
+            encoded[:, i] = self.plugboards[rows, signal]
+
+        return encoded
+
+    def __step_rotors__(self, positions):
+        """
+        Steps the rotors of every enigma machine in the batch in place, following the
+        same rules as RotorCradle.step_rotors
+        """
+        on_notch = positions[:, :2] == self.notches[:, :2]
+        middle_rotor_steps = on_notch[:, 0] | on_notch[:, 1]
+        left_rotor_steps = on_notch[:, 1]
+
+        positions[:, 0] += 1
+        positions[:, 1] += middle_rotor_steps
+        positions[:, 2] += left_rotor_steps
+        positions[:, :3] %= 26
+
+    def find_cribs(self, encoded, cribs, crib_positions=None):
+        """
+        Checks which of the encoded strings contain each crib, returning a
+        (len(cribs), batch) array of booleans
+
+        If crib_positions (see get_crib_positions) are given, each crib is only
+        looked for at the positions it could be at
+        """
+        string_length = encoded.shape[1]
+        crib_matches = np.zeros((len(cribs), encoded.shape[0]), dtype=bool)
+
+        for i, crib in enumerate(cribs):
+            if len(crib) > string_length:
+                continue
+
+            crib_pins = np.array([ord(char) - 65 for char in crib], dtype=np.int64)
+            windows = np.lib.stride_tricks.sliding_window_view(
+                encoded, len(crib), axis=1
+            )
+            if crib_positions is not None:
+                windows = windows[:, crib_positions[crib]]
+
+            crib_matches[i] = (windows == crib_pins).all(axis=2).any(axis=1)
+
+        return crib_matches
+
+
+def convert_pins_to_string(pins):
+    return bytes(pin + 65 for pin in pins.tolist()).decode("ascii")
@@ -0,0 +1,321 @@
+from enigma import *
+from cracking_secrets_helpers import *
+from keyspace import *
+
+
+class Menu:
+    """
+    Represents the menu that a bombe is wired up from
+
+    When a crib is lined up against the code at crib_position, every letter of the
+    crib is paired with the letter of the code that it was encoded to. If the
+    plugboard swaps a letter with stecker(letter), and the rotor cradle applies the
+    substitution P at that point in the message, then:
+
+    stecker(code letter) = P(stecker(crib letter))
+
+    Each of these pairs is an edge in a graph of letters, labelled with the offset
+    (the index of the letter in the code) that tells us which substitution joins
+    them. A guess at the plugboard partner of one letter in the graph can then be
+    followed along the edges to work out the partner of every letter connected to it
+    """
+
+    def __init__(self, crib, code, crib_position):
+        if crib_position < 0 or crib_position + len(crib) > len(code):
+            raise BombeError("The crib must fit inside the code at its position")
+
+        if crib_position not in get_possible_crib_positions(code, crib):
+            raise BombeError(
+                "The crib can't be at this position since a letter would be encoded to itself"
+            )
+
+        self.crib = crib
+        self.code = code
+        self.crib_position = crib_position
+        # the number of key presses needed to reach the end of the crib
+        self.length = crib_position + len(crib)
+        # the letters that each letter is connected to, along with the offset of
+        # the substitution that connects them
+        self.connections = {}
+
+        for i, crib_character in enumerate(crib):
+            offset = crib_position + i
+            crib_pin = ord(crib_character) - 65
+            code_pin = ord(code[offset]) - 65
+            self.connections.setdefault(crib_pin, []).append((code_pin, offset))
+            self.connections.setdefault(code_pin, []).append((crib_pin, offset))
+
+        self.offsets = set(range(crib_position, self.length))
+        self.test_pins = self.__get_test_pins__()
+
+    def __get_test_pins__(self):
+        """
+        Picks the letter that each guess is made about (the test register on a real
+        bombe) for every part of the menu that needs to be tested
+
+        A part of the menu with no loops can't contradict a guess on its own, so only
+        the parts with loops are tested, along with the largest part of the menu if
+        none of them have any loops. Within each part, the letter with the most
+        connections is picked, since a wrong guess about it is ruled out soonest
+        """
+        components = []
+        pins_seen = set()
+
+        for pin in self.connections:
+            if pin in pins_seen:
+                continue
+
+            component = []
+            pins_to_visit = [pin]
+            pins_seen.add(pin)
+
+            while pins_to_visit:
+                component_pin = pins_to_visit.pop()
+                component.append(component_pin)
+
+                for connected_pin, _ in self.connections[component_pin]:
+                    if connected_pin not in pins_seen:
+                        pins_seen.add(connected_pin)
+                        pins_to_visit.append(connected_pin)
+
+            components.append(component)
+
+        components.sort(key=len, reverse=True)
+
+        test_pins = []
+        for i, component in enumerate(components):
+            number_of_connections = sum(
+                len(self.connections[component_pin]) for component_pin in component
+            )
+            # every connection is counted from both of its letters
+            has_loop = number_of_connections // 2 >= len(component)
+
+            if has_loop or i == 0:
+                test_pins.append(
+                    max(
+                        component,
+                        key=lambda component_pin: len(self.connections[component_pin]),
+                    )
+                )
+
+        return test_pins
+
+    def __str__(self):
+        return f"{self.crib}@{self.crib_position}"
+
+    def __repr__(self):
+        return f"{self.crib}@{self.crib_position}"
+
+
+class Bombe:
+    """
+    Deduces what the plugboard must look like from a crib, rather than trying every
+    possible lead setting
+
+    For each set of rotor settings (a stop), the bombe compiles the substitutions the
+    rotor cradle applies at every offset in the menu (see Menu), and then guesses the
+    plugboard partner of a letter in the menu. Each guess is followed through the
+    menu, and as soon as a letter would need two different partners, the guess is
+    thrown away. Most stops have no guesses left, and the ones that survive come with
+    the leads that the menu proves must be on the plugboard
+
+    Leads that are already known (known_lead_settings) are filled in before any
+    guesses are made, so they rule out more guesses
+    """
+
+    def __init__(self, menu, known_lead_settings=[], keystream_cache=None):
+        self.menu = menu
+        self.keystream_cache = keystream_cache
+        self.known_steckers = [None] * 26
+
+        for lead_setting in known_lead_settings:
+            first_pin, second_pin = (
+                ord(char) - 65 for char in PlugLead(lead_setting).characters
+            )
+            if not self.__connect__(self.known_steckers, first_pin, second_pin):
+                raise BombeError(
+                    "The known lead settings have one of their letters taken twice",
+                    known_lead_settings,
+                )
+
+    def get_stops(self, rotor_names, ring_settings, position_settings, reflector):
+        """
+        Gets every plugboard that survives the menu for one set of rotor settings,
+        where reflector is a dict like the ones EnigmaCodeCracker takes
+        """
+        permutations = self.__get_permutations__(
+            rotor_names, ring_settings, position_settings, reflector
+        )
+
+        steckers_that_survive = [self.known_steckers]
+        for test_pin in self.menu.test_pins:
+            steckers_that_survive = [
+                guessed_steckers
+                for steckers in steckers_that_survive
+                for guessed_steckers in self.__guess__(steckers, test_pin, permutations)
+            ]
+
+        return [
+            {
+                "rotor_names": rotor_names,
+                "ring_settings": ring_settings,
+                "position_settings": position_settings,
+                "reflector": reflector,
+                **convert_steckers_to_lead_settings(steckers),
+            }
+            for steckers in steckers_that_survive
+        ]
+
+    def run(self, rotor_names, ring_settings, position_settings, reflectors):
+        """
+        Lazily tests every combination of rotor settings, yielding each stop along
+        with the plugboard it implies
+        """
+        keyspace = Keyspace(
+            rotor_names, ring_settings, position_settings, reflectors, [[]]
+        )
+
+        for reflector, ring_setting, rotor_name, position_setting, _ in keyspace:
+            yield from self.get_stops(
+                rotor_name, ring_setting, position_setting, reflector
+            )
+
+    def __get_permutations__(
+        self, rotor_names, ring_settings, position_settings, reflector
+    ):
+        """
+        Steps the rotor cradle through the menu, keeping the substitution it applies
+        at each offset in the menu
+        """
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            rotor_names,
+            ring_settings,
+            position_settings,
+            reflector_name=reflector.get("name"),
+            custom_reflector_mapping=reflector.get("custom_reflector_mapping"),
+            keystream_cache=self.keystream_cache,
+        )
+        rotor_cradle = enigma_machine.rotor_cradle
+        permutations = {}
+
+        for offset in range(self.menu.length):
+            rotor_cradle.step_rotors()
+            if offset in self.menu.offsets:
+                permutations[offset] = rotor_cradle.get_permutation()
+
+        return permutations
+
+    def __guess__(self, steckers, test_pin, permutations):
+        """
+        Guesses every partner for the test pin (unless it already has one) and
+        follows each guess through the menu, giving back the steckers for every
+        guess that doesn't contradict itself
+        """
+        if steckers[test_pin] is not None:
+            partners_to_guess = [steckers[test_pin]]
+        else:
+            partners_to_guess = range(26)
+
+        for partner in partners_to_guess:
+            guessed_steckers = list(steckers)
+
+            if self.__connect__(guessed_steckers, test_pin, partner) and (
+                self.__follow_menu__(guessed_steckers, test_pin, permutations)
+            ):
+                yield guessed_steckers
+
+    def __follow_menu__(self, steckers, test_pin, permutations):
+        connections = self.menu.connections
+        pins_to_follow = [test_pin]
+        pins_followed = set()
+
+        while pins_to_follow:
+            pin = pins_to_follow.pop()
+            if pin in pins_followed:
+                continue
+
+            pins_followed.add(pin)
+
+            for connected_pin, offset in connections[pin]:
+                connected_partner = permutations[offset][steckers[pin]]
+
+                if not self.__connect__(steckers, connected_pin, connected_partner):
+                    return False
+
+                pins_to_follow.append(connected_pin)
+
+        return True
+
+    def __connect__(self, steckers, pin, partner):
+        """
+        Puts a lead between pin and partner (a pin can also be its own partner if it
+        has no lead), returning False if either of them already has another partner
+        """
+        if steckers[pin] is not None or steckers[partner] is not None:
+            return steckers[pin] == partner and steckers[partner] == pin
+
+        steckers[pin] = partner
+        steckers[partner] = pin
+
+        return True
+
+    def __str__(self):
+        return f"Bombe({self.menu})"
+
+    def __repr__(self):
+        return f"Bombe({self.menu})"
+
+
+def convert_steckers_to_lead_settings(steckers):
+    """
+    Turns the partner of every pin into the lead settings that EnigmaMachineFactory
+    takes, along with the letters that are known to have no lead
+    """
+    lead_settings = []
+    letters_without_leads = []
+
+    for pin, partner in enumerate(steckers):
+        if partner is None or partner < pin:
+            continue
+
+        if partner == pin:
+            letters_without_leads.append(chr(pin + 65))
+        else:
+            lead_settings.append(chr(pin + 65) + chr(partner + 65))
+
+    return {
+        "lead_settings": lead_settings,
+        "letters_without_leads": "".join(letters_without_leads),
+    }
+
+
+def get_bombe_stops(
+    crib,
+    code,
+    rotor_names,
+    ring_settings,
+    position_settings,
+    reflectors,
+    known_lead_settings=[],
+    keystream_cache=None,
+):
+    """
+    Runs a bombe for every position in the code that the crib could be at, lazily
+    yielding every stop along with the position of the crib
+    """
+    position_settings = list(position_settings)
+    ring_settings = list(ring_settings)
+    rotor_names = list(rotor_names)
+    reflectors = list(reflectors)
+
+    for crib_position in get_possible_crib_positions(code, crib):
+        bombe = Bombe(
+            Menu(crib, code, crib_position),
+            known_lead_settings=known_lead_settings,
+            keystream_cache=keystream_cache,
+        )
+
+        for stop in bombe.run(
+            rotor_names, ring_settings, position_settings, reflectors
+        ):
+            yield {"crib_position": crib_position, **stop}
@@ -0,0 +1,126 @@
+from enigma import *
+from cracking_secrets import *
+import heapq
+
+# the number of best scoring candidates that CiphertextOnlyCracker keeps hold of
+DEFAULT_NUMBER_OF_CANDIDATES = 10
+
+
+class CiphertextOnlyCracker:
+    """
+    Searches for the rotor settings of a code when there is no crib to go on
+
+    Text in a natural language uses some letters far more than others, whereas text
+    decoded with the wrong settings has its letters spread out almost evenly. The
+    index of coincidence (the chance that two letters picked from the text are the
+    same) measures this, so every combination of settings is scored by the index of
+    coincidence of the text it decodes to, and the best scoring ones are kept
+
+    The plugboard is usually left empty (or only the leads that are known are used),
+    since the rotors alone still decode enough letters correctly to stand out. Only
+    number_of_candidates of the best scores are ever kept (in a heap), however many
+    combinations of settings there are
+    """
+
+    def __init__(
+        self,
+        code,
+        rotor_names,
+        position_settings,
+        ring_settings,
+        reflectors,
+        lead_settings=[[]],
+        number_of_candidates=DEFAULT_NUMBER_OF_CANDIDATES,
+    ):
+        if not is_valid_enigma_input_string(code):
+            raise CiphertextOnlyCrackerError(
+                "The code must be uppercase letters of the alphabet only with no spaces"
+            )
+
+        if number_of_candidates < 1:
+            raise CiphertextOnlyCrackerError(
+                "The number of candidates must be at least 1"
+            )
+
+        self.code = code
+        self.number_of_candidates = number_of_candidates
+        self.keyspace = Keyspace(
+            rotor_names, ring_settings, position_settings, reflectors, lead_settings
+        )
+        self.number_of_enigma_machines_checked = 0
+        self.candidates = self.__crack__()
+
+    def __crack__(self):
+        code_pins = convert_string_to_pins(self.code)
+        best_scores = []
+
+        for rank, enigma_machine in create_valid_enigma_machines(
+            self.keyspace, reuse_enigma_machine=True
+        ):
+            score = (count_coincidences(enigma_machine, code_pins), -rank)
+            self.number_of_enigma_machines_checked += 1
+
+            if len(best_scores) < self.number_of_candidates:
+                heapq.heappush(best_scores, score)
+            elif score > best_scores[0]:
+                heapq.heapreplace(best_scores, score)
+
+        # only the candidates that are kept are decoded into strings, with a fresh
+        # enigma machine created from the rank of their settings
+        candidates = []
+        for coincidences, negative_rank in sorted(best_scores, reverse=True):
+            rank = -negative_rank
+
+            for _, enigma_machine in create_valid_enigma_machines(
+                self.keyspace.get_range(rank, rank + 1)
+            ):
+                decoded_string = enigma_machine.encode(self.code)
+                candidates.append(
+                    {
+                        "enigma_machine": enigma_machine,
+                        "decoded_string": decoded_string,
+                        "index_of_coincidence": get_index_of_coincidence(
+                            coincidences, len(self.code)
+                        ),
+                    }
+                )
+
+        return candidates
+
+    def print_candidates(self):
+        for candidate in self.candidates:
+            print(candidate)
+
+
+def convert_string_to_pins(string):
+    return [ord(char) - 65 for char in string]
+
+
+def count_coincidences(enigma_machine, code_pins):
+    """
+    Decodes the code one pin at a time and counts the number of ordered pairs of
+    decoded letters that are the same, which is sum(count * (count - 1)) over the
+    count of each letter
+
+    Rather than counting the letters and working this out at the end, the total is
+    kept up to date as each letter is decoded: the nth time a letter is seen, it
+    makes a pair with each of the n - 1 times it was seen before (in both orders)
+    """
+    plugboard_pins = enigma_machine.plugboard.get_pins()
+    encode_pin = enigma_machine.rotor_cradle.encode_pin
+    letter_counts = [0] * 26
+    coincidences = 0
+
+    for pin in code_pins:
+        decoded_pin = plugboard_pins[encode_pin(plugboard_pins[pin])]
+        coincidences += 2 * letter_counts[decoded_pin]
+        letter_counts[decoded_pin] += 1
+
+    return coincidences
+
+
+def get_index_of_coincidence(coincidences, string_length):
+    if string_length < 2:
+        return 0
+
+    return coincidences / (string_length * (string_length - 1))
@@ -1,8 +1,24 @@
 from enigma import *
 from enigma_helpers import *
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import itertools as it
+import os
+import pickle
 import string
+import time
 from cracking_secrets_helpers import *
+from batched_engine import *
+from keyspace import *
+from keystream import *
+
+# the cracking_code functions use the batched engine whenever NumPy is installed
+BATCH_SIZE = DEFAULT_BATCH_SIZE if is_batched_engine_available() else None
+# the number of combinations of settings that are checked at a time, either by
+# a worker when cracking codes in parallel or between checkpoints
+DEFAULT_CHUNK_SIZE = 1024
+# the number of seconds between saving checkpoints
+DEFAULT_CHECKPOINT_INTERVAL = 60
 
 
 class EnigmaCodeCracker:
@@ -16,6 +32,32 @@ class EnigmaCodeCracker:
 
     Currently only supports printing potential solutions but this could be
     extended to support returning potential solutions, too
+
+    If a batch_size is given, the enigma machines are decoded batch_size at a time
+    with the BatchedEnigmaEngine (see batched_engine.py), which needs NumPy but is
+    much faster when there are lots of enigma machines to try
+
+    Every combination of settings is held in a Keyspace (see keyspace.py). If a
+    number of workers is given, the keyspace is split into ranges of chunk_size
+    combinations, which are checked by that many worker processes at the same
+    time. The potential solutions come back in the same order as they would
+    if the code was cracked in a single process
+
+    If a checkpoint_path is given, how far through the keyspace we have got and
+    the potential solutions found so far are saved there every
+    checkpoint_interval seconds, and if resume is True, cracking picks up from
+    the checkpoint rather than starting again
+
+    Cracking can be stopped early once max_solutions potential solutions have
+    been found (i.e max_solutions=1 stops at the first match), once time_budget
+    seconds have passed or once candidate_budget combinations of settings have
+    been checked. get_keyspace_coverage tells you how much of the keyspace was
+    checked
+
+    If sweep_positions is True, the substitutions for every start position of a set
+    of rotors, ring settings and reflector are compiled once and each start position
+    decodes with a window into them (see PositionSweep in keystream.py), which is
+    much faster when lots of position settings are being tried
     """
 
     def __init__(
@@ -27,6 +69,16 @@ class EnigmaCodeCracker:
         ring_settings,
         reflectors,
         lead_settings,
+        batch_size=None,
+        workers=None,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        checkpoint_path=None,
+        checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+        resume=False,
+        max_solutions=None,
+        time_budget=None,
+        candidate_budget=None,
+        sweep_positions=False,
     ):
         if len(cribs) == 0:
             raise EnigmaCodeCrackerError("You must provide at least one crib")
@@ -40,86 +92,267 @@ class EnigmaCodeCracker:
             raise EnigmaCodeCrackerError(
                 "Code must be a string with at least one character"
             )
-        valid_enigma_machines = self.__create_valid_enigma_machines_from_settings__(
-            rotor_names, ring_settings, position_settings, reflectors, lead_settings
-        )
+
+        if batch_size is not None and batch_size < 1:
+            raise EnigmaCodeCrackerError("The batch size must be at least 1")
+
+        if batch_size is not None and sweep_positions:
+            raise EnigmaCodeCrackerError(
+                "Positions can only be swept when the code isn't decoded in batches"
+            )
+
+        if workers is not None and workers < 1:
+            raise EnigmaCodeCrackerError("The number of workers must be at least 1")
+
+        if chunk_size < 1:
+            raise EnigmaCodeCrackerError("The chunk size must be at least 1")
+
+        if checkpoint_interval < 0:
+            raise EnigmaCodeCrackerError("The checkpoint interval cannot be negative")
+
+        if max_solutions is not None and max_solutions < 1:
+            raise EnigmaCodeCrackerError("The maximum solutions must be at least 1")
+
+        if time_budget is not None and time_budget < 0:
+            raise EnigmaCodeCrackerError("The time budget cannot be negative")
+
+        if candidate_budget is not None and candidate_budget < 0:
+            raise EnigmaCodeCrackerError("The candidate budget cannot be negative")
+
         self.cribs = cribs
         self.code = code
-        self.valid_enigma_machines = valid_enigma_machines
-        self.potential_solutions = self.__get_potential_solutions__(
-            valid_enigma_machines
+        # the only positions in the code that each crib could be at, since an enigma
+        # machine never encodes a letter to itself
+        self.crib_positions = get_crib_positions(cribs, code)
+        # worked out once for the whole crack rather than for every chunk
+        self.crib_checks = get_crib_checks(cribs, code, self.crib_positions)
+        self.batch_size = batch_size
+        # the position sweeps are kept for the whole crack rather than for a chunk,
+        # since they take far longer to lay out than a chunk takes to check
+        self.sweep_positions = sweep_positions
+        self.position_sweeps = PositionSweeps(len(code)) if sweep_positions else None
+        self.max_solutions = max_solutions
+        self.keyspace = Keyspace(
+            rotor_names, ring_settings, position_settings, reflectors, lead_settings
         )
+        self.checkpoint_path = checkpoint_path
+        # what the checkpoint knows the keyspace by, so resuming with a different
+        # keyspace of the same size is refused (worked out once, since it hashes
+        # every setting)
+        self.keyspace_fingerprint = (
+            self.keyspace.get_fingerprint() if checkpoint_path is not None else None
+        )
+        # the enigma machines are created and checked one at a time, so we only
+        # keep count of how many have been checked rather than holding on to them
+        self.number_of_enigma_machines_checked = 0
+        # every combination of settings with a rank lower than this has been checked
+        self.next_rank = 0
+        self.potential_solutions = []
+        # why cracking stopped, which is one of "finished", "max_solutions",
+        # "time_budget" or "candidate_budget"
+        self.stop_reason = None
 
-    def __create_valid_enigma_machines_from_settings__(
-        self,
-        rotor_names=[],
-        ring_settings=[],
-        position_settings=[],
-        reflectors=[],
-        lead_settings=[],
+        if resume and checkpoint_path and os.path.exists(checkpoint_path):
+            self.__load_checkpoint__()
+
+        self.__crack__(
+            workers, chunk_size, checkpoint_interval, time_budget, candidate_budget
+        )
+
+    def __crack__(
+        self, workers, chunk_size, checkpoint_interval, time_budget, candidate_budget
     ):
         """
-        Creates valid enigma machines from inputs
+        Checks the keyspace a chunk at a time, from where we last got to, and
+        saves a checkpoint every checkpoint_interval seconds (if there is a
+        checkpoint path), when cracking stops, and when cracking is interrupted
+
+        Cracking stops early once max_solutions potential solutions have been
+        found, once candidate_budget combinations of settings have been checked,
+        or once time_budget seconds have passed. The time budget is only checked
+        between chunks, so a smaller chunk size makes it more accurate
         """
-        valid_enigma_machines = []
-        for reflector in reflectors:
-            for ring_setting in ring_settings:
-                for rotor_name in rotor_names:
-                    for position_setting in position_settings:
-                        for lead_setting in lead_settings:
-                            try:
-                                enigma_machine = (
-                                    EnigmaMachineFactory.create_enigma_machine(
-                                        rotor_name,
-                                        ring_setting,
-                                        position_setting,
-                                        lead_settings=lead_setting,
-                                        reflector_name=reflector.get("name"),
-                                        custom_reflector_mapping=reflector.get(
-                                            "custom_reflector_mapping"
-                                        ),
-                                    )
-                                )
-
-                                valid_enigma_machines.append(enigma_machine)
-                            except Exception as err:
-                                # It might be the case that sometimes the enigma machine
-                                # cannot be created as there are faulty settings in them.
-                                # We want to swallow these but still see the error message
-                                # to:
-                                # 1. reduce time and space complexity. If we try to create
-                                # too many enigma machines that are faulty, then we are
-                                # potentially both increasing the time it takes to crack
-                                # codes and using up more memory than is necessary
-                                # 2. we want to swallow errors because even if our settings
-                                # were incompatible with an enigma machine setup, then we
-                                # still want to see whether we can crack the code
-                                # with another enigma machine created with different settings
-                                # because it will a. tell us that we have cracked the code and
-                                # b. give us an indication on how good our implementation is
-                                print(err)
-
-        return valid_enigma_machines
-
-    def __get_potential_solutions__(self, valid_enigma_machines):
+        stop_rank = len(self.keyspace)
+        if candidate_budget is not None:
+            stop_rank = min(stop_rank, self.next_rank + candidate_budget)
+
+        keyspace_left = self.keyspace.get_range(self.next_rank, stop_rank)
+        checked_chunks = self.__check_chunks__(keyspace_left, workers, chunk_size)
+        start_time = last_checkpoint_time = time.monotonic()
+        self.stop_reason = "finished" if stop_rank == len(self.keyspace) else None
+
+        try:
+            for (
+                stop,
+                number_of_enigma_machines_checked,
+                ranked_potential_solutions,
+            ) in checked_chunks:
+                self.number_of_enigma_machines_checked += (
+                    number_of_enigma_machines_checked
+                )
+                self.next_rank = stop
+
+                for rank, potential_solution in ranked_potential_solutions:
+                    self.potential_solutions.append(potential_solution)
+
+                    if self.__has_found_enough_potential_solutions__():
+                        # anything after this rank still needs to be checked if
+                        # cracking is resumed later on
+                        self.next_rank = rank + 1
+                        break
+
+                if (
+                    self.checkpoint_path
+                    and time.monotonic() - last_checkpoint_time >= checkpoint_interval
+                ):
+                    self.__save_checkpoint__()
+                    last_checkpoint_time = time.monotonic()
+
+                if self.__has_found_enough_potential_solutions__():
+                    self.stop_reason = "max_solutions"
+                    break
+
+                if (
+                    time_budget is not None
+                    and time.monotonic() - start_time >= time_budget
+                    and self.next_rank < stop_rank
+                ):
+                    self.stop_reason = "time_budget"
+                    break
+            else:
+                if self.stop_reason is None:
+                    self.stop_reason = "candidate_budget"
+        except KeyboardInterrupt:
+            if self.checkpoint_path:
+                self.__save_checkpoint__()
+            raise
+        finally:
+            checked_chunks.close()
+
+        if self.checkpoint_path:
+            self.__save_checkpoint__()
+
+    def __has_found_enough_potential_solutions__(self):
+        return (
+            self.max_solutions is not None
+            and len(self.potential_solutions) >= self.max_solutions
+        )
+
+    def get_keyspace_coverage(self):
         """
-        Gets the enigma machine setting and the decoded string for any
-        enigma machine that finds one of the cribs within the decoded
-        string
+        Gets the fraction of the keyspace that has been checked
         """
-        potential_solutions = []
-        for enigma_machine in valid_enigma_machines:
-            decoded_string = enigma_machine.encode(self.code)
-            for crib in self.cribs:
-                if crib in decoded_string:
-                    potential_solutions.append(
-                        {
-                            "enigma_machine": enigma_machine,
-                            "decoded_string": decoded_string,
-                        }
+        if len(self.keyspace) == 0:
+            return 1.0
+
+        return self.next_rank / len(self.keyspace)
+
+    def __check_chunks__(self, keyspace, workers, chunk_size):
+        """
+        Lazily checks every chunk_size combinations of settings in the keyspace,
+        giving back the rank the chunk stops at, how many valid enigma machines
+        were checked and the potential solutions that were found, in the order
+        the chunks appear in the keyspace
+
+        If there are workers, chunks are sent to worker processes as ranges of the
+        keyspace. Each worker is given the keyspace once when it starts, so a range
+        only needs to be sent as its start and stop rank, and only a few ranges per
+        worker are sent at a time, so we never hold on to more than a few chunks
+        worth of potential solutions that are waiting to be gathered. Any ranges
+        that are still waiting to be checked when cracking stops are cancelled
+        """
+        if workers is None:
+            for start, stop in keyspace.get_ranges(chunk_size):
+                yield crack_keyspace(
+                    self.cribs,
+                    self.code,
+                    keyspace.get_range(start, stop),
+                    self.batch_size,
+                    self.max_solutions,
+                    self.position_sweeps,
+                    self.crib_checks,
+                    self.crib_positions,
+                )
+
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=set_up_worker,
+            initargs=(
+                self.cribs,
+                self.code,
+                self.keyspace,
+                self.batch_size,
+                self.max_solutions,
+                self.sweep_positions,
+            ),
+        ) as executor:
+            chunks_being_checked = deque()
+
+            try:
+                for start, stop in keyspace.get_ranges(chunk_size):
+                    chunks_being_checked.append(
+                        executor.submit(crack_keyspace_range, start, stop)
                     )
 
-        return potential_solutions
+                    if len(chunks_being_checked) >= 2 * workers:
+                        yield chunks_being_checked.popleft().result()
+
+                while chunks_being_checked:
+                    yield chunks_being_checked.popleft().result()
+            finally:
+                for chunk_being_checked in chunks_being_checked:
+                    chunk_being_checked.cancel()
+
+    def __save_checkpoint__(self):
+        """
+        Saves how far through the keyspace we have got and the potential solutions
+        found so far, so that cracking can be resumed from there
+
+        The checkpoint is written to a temporary file first and then moved into
+        place, so an interruption while saving never leaves a broken checkpoint
+        """
+        checkpoint = {
+            "cribs": self.cribs,
+            "code": self.code,
+            "keyspace_size": len(self.keyspace),
+            "keyspace_fingerprint": self.keyspace_fingerprint,
+            "next_rank": self.next_rank,
+            "number_of_enigma_machines_checked": self.number_of_enigma_machines_checked,
+            "potential_solutions": self.potential_solutions,
+        }
+        temporary_checkpoint_path = f"{self.checkpoint_path}.tmp"
+
+        with open(temporary_checkpoint_path, "wb") as checkpoint_file:
+            pickle.dump(checkpoint, checkpoint_file)
+
+        os.replace(temporary_checkpoint_path, self.checkpoint_path)
+
+    def __load_checkpoint__(self):
+        """
+        Picks up from a checkpoint saved by __save_checkpoint__. Checkpoints are
+        pickled, so only resume from checkpoint files that you created yourself
+        """
+        with open(self.checkpoint_path, "rb") as checkpoint_file:
+            checkpoint = pickle.load(checkpoint_file)
+
+        if (
+            checkpoint["cribs"] != self.cribs
+            or checkpoint["code"] != self.code
+            or checkpoint["keyspace_size"] != len(self.keyspace)
+            or checkpoint.get("keyspace_fingerprint") != self.keyspace_fingerprint
+        ):
+            raise EnigmaCodeCrackerError(
+                "The checkpoint was saved while cracking a different code or keyspace",
+                self.checkpoint_path,
+            )
+
+        self.next_rank = checkpoint["next_rank"]
+        self.number_of_enigma_machines_checked = checkpoint[
+            "number_of_enigma_machines_checked"
+        ]
+        self.potential_solutions = checkpoint["potential_solutions"]
 
     def print_potential_solutions(self):
         print("---------------------------")
@@ -129,9 +362,386 @@ class EnigmaCodeCracker:
         else:
             print("Looks like you did not find any potential solutions\n")
             print("Try changing the settings on the enigma machine")
+        print(
+            f"Checked {self.next_rank} of {len(self.keyspace)} combinations of "
+            f"settings ({self.get_keyspace_coverage():.2%}), stopped because: "
+            f"{self.stop_reason}"
+        )
         print("---------------------------")
 
 
+def create_valid_enigma_machines(keyspace, reuse_enigma_machine=False):
+    """
+    Lazily creates an enigma machine for every combination of settings in the
+    keyspace, along with the rank of its settings
+
+    If reuse_enigma_machine is True, one enigma machine is re-keyed in place for
+    every combination of settings with the same rotors and reflector as the one
+    before it (see EnigmaMachine.set_positions), rather than creating a new one, so
+    each enigma machine must be finished with (or copied) before the next one is
+    asked for
+    """
+    enigma_machine = None
+    rotors_and_reflector = None
+
+    for rank, (
+        reflector,
+        ring_setting,
+        rotor_name,
+        position_setting,
+        lead_setting,
+    ) in zip(range(keyspace.start, keyspace.stop), keyspace):
+        try:
+            if reuse_enigma_machine and rotors_and_reflector == (
+                rotor_name,
+                reflector,
+            ):
+                enigma_machine.set_rings(ring_setting)
+                enigma_machine.set_positions(position_setting)
+                enigma_machine.set_plugboard(lead_setting)
+            else:
+                rotors_and_reflector = None
+                enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+                    rotor_name,
+                    ring_setting,
+                    position_setting,
+                    lead_settings=lead_setting,
+                    reflector_name=reflector.get("name"),
+                    custom_reflector_mapping=reflector.get("custom_reflector_mapping"),
+                )
+                rotors_and_reflector = (rotor_name, reflector)
+        except Exception as err:
+            # It might be the case that sometimes the enigma machine
+            # cannot be created as there are faulty settings in them.
+            # We want to swallow these but still see the error message
+            # to:
+            # 1. reduce time and space complexity. If we try to create
+            # too many enigma machines that are faulty, then we are
+            # potentially both increasing the time it takes to crack
+            # codes and using up more memory than is necessary
+            # 2. we want to swallow errors because even if our settings
+            # were incompatible with an enigma machine setup, then we
+            # still want to see whether we can crack the code
+            # with another enigma machine created with different settings
+            # because it will a. tell us that we have cracked the code and
+            # b. give us an indication on how good our implementation is
+            print(err)
+        else:
+            yield rank, enigma_machine
+
+
+def get_potential_solutions(
+    cribs,
+    code,
+    ranked_enigma_machines,
+    batch_size=None,
+    position_sweeps=None,
+    crib_checks=None,
+    crib_positions=None,
+):
+    """
+    Lazily gets the enigma machine and the decoded string for any enigma
+    machine that finds one of the cribs within the decoded string, along with
+    the rank of the enigma machine's settings
+
+    The code is decoded one character at a time, and decoding stops as soon as
+    none of the cribs can be at any of their possible positions in the code
+    (see get_crib_checks), so most enigma machines are ruled out within the
+    first few characters
+
+    Enigma machines that only differ by their lead settings or their reflector
+    send signals along exactly the same route through the rotors. The first enigma
+    machine with a new set of wheel settings decodes the code on its own, and if
+    another one comes along, the route is compiled once into a Keystream (see
+    SharedKeystreams) that every other enigma machine with the same wheel settings
+    decodes with, so each of them only needs a few lookups per character
+
+    If position_sweeps (see PositionSweeps in keystream.py) are given, every enigma
+    machine decodes with a window into a PositionSweep instead, which is shared by
+    every start position of the same rotors, ring settings and reflector
+
+    If a batch_size is given, the code is decoded with batch_size enigma
+    machines at a time, and every decoded string in the batch is checked for
+    the cribs at once, only at the positions each crib could be at
+
+    crib_positions (see get_crib_positions) and crib_checks (see get_crib_checks)
+    are worked out from the cribs if they aren't given
+    """
+    if crib_positions is None:
+        crib_positions = get_crib_positions(cribs, code)
+
+    if batch_size is None:
+        if crib_checks is None:
+            crib_checks = get_crib_checks(cribs, code, crib_positions)
+
+        code_pins = [ord(char) - 65 for char in code]
+        shared_keystreams = SharedKeystreams()
+
+        for rank, enigma_machine in ranked_enigma_machines:
+            rotor_cradle = enigma_machine.rotor_cradle
+
+            if position_sweeps is not None:
+                window = position_sweeps.get_window(rotor_cradle)
+                decode_pin = get_pin_decoder(enigma_machine, window=window)
+            else:
+                keystream = shared_keystreams.get_keystream(rotor_cradle)
+                decode_pin = get_pin_decoder(enigma_machine, keystream)
+
+            decoded_string = decode_if_cribs_can_match(
+                decode_pin, code_pins, crib_checks
+            )
+            if decoded_string is None:
+                continue
+
+            for crib in cribs:
+                if crib in decoded_string:
+                    # the enigma machine might be re-keyed for the next settings
+                    # (see create_valid_enigma_machines), so we keep a copy of it
+                    yield rank, {
+                        "enigma_machine": enigma_machine.copy(),
+                        "decoded_string": decoded_string,
+                    }
+
+        return
+
+    for ranked_enigma_machines_in_batch in get_chunks(
+        ranked_enigma_machines, batch_size
+    ):
+        ranks, enigma_machines_in_batch = zip(*ranked_enigma_machines_in_batch)
+        batched_enigma_engine = BatchedEnigmaEngine(enigma_machines_in_batch)
+        decoded = batched_enigma_engine.encode(code)
+        crib_matches = batched_enigma_engine.find_cribs(decoded, cribs, crib_positions)
+
+        for i in crib_matches.any(axis=0).nonzero()[0]:
+            decoded_string = convert_pins_to_string(decoded[i])
+            for crib_matched in crib_matches[:, i]:
+                if crib_matched:
+                    yield ranks[i], {
+                        "enigma_machine": enigma_machines_in_batch[i],
+                        "decoded_string": decoded_string,
+                    }
+
+
+def get_crib_checks(cribs, code, crib_positions=None):
+    """
+    Works out what needs to be checked while decoding the code to know whether any
+    of the cribs could be in it
+
+    While the code is decoded, a bitmask keeps track of every crib that could
+    still start at one of the last few indexes. Each crib has its own field of bits
+    in the bitmask, where bit k of the field is set if the crib could start k
+    indexes before the one being decoded. For each index, starts holds the bit of
+    every crib that could start there (see get_crib_positions), and for
+    each pin, matches holds bit k of every crib whose letter k is that pin. This
+    means every position of every crib is checked against a decoded character with
+    a shift and a single &, and apart from starts (one small number for each index)
+    only 26 masks are kept, however long the code is
+
+    crib_ends holds the bit of the last letter of every crib, and last_start is the
+    last index that any crib could start at. The checks only depend on the cribs and
+    the code, so they are worked out once for each crack rather than for every
+    chunk of the keyspace
+    """
+    if crib_positions is None:
+        crib_positions = get_crib_positions(cribs, code)
+
+    field_width = max((len(crib) for crib in cribs), default=0)
+    starts = [0] * len(code)
+    matches = [0] * 26
+    crib_ends = 0
+    last_start = -1
+
+    for i, crib in enumerate(cribs):
+        field = i * field_width
+
+        for position in crib_positions[crib]:
+            starts[position] |= 1 << field
+            last_start = max(last_start, position)
+
+        for k, crib_character in enumerate(crib):
+            matches[ord(crib_character) - 65] |= 1 << (field + k)
+
+        crib_ends |= 1 << (field + len(crib) - 1)
+
+    return tuple(starts), tuple(matches), crib_ends, last_start
+
+
+def get_pin_decoder(enigma_machine, keystream=None, window=None):
+    """
+    Gets a function that decodes the pin typed at each key press with the enigma
+    machine, either with its own rotor cradle, with a Keystream shared with other
+    enigma machines that have the same wheel settings, or with a window into a
+    PositionSweep (see PositionSweep.get_window). Either way, the plugboard is
+    applied with a lookup (see Plugboard.get_pins)
+    """
+    plugboard_pins = enigma_machine.plugboard.get_pins()
+
+    if window is not None:
+        keystream_bytes, offset = window
+
+        def decode_pin(key_press, pin):
+            return plugboard_pins[
+                keystream_bytes[(offset + key_press) * 26 + plugboard_pins[pin]]
+            ]
+
+        return decode_pin
+
+    if keystream is None:
+        encode_pin = enigma_machine.rotor_cradle.encode_pin
+
+        def decode_pin(key_press, pin):
+            return plugboard_pins[encode_pin(plugboard_pins[pin])]
+
+        return decode_pin
+
+    reflector_pins = enigma_machine.rotor_cradle.reflector.get_pins()
+
+    if reflector_pins == keystream.reflector_pins:
+        get_permutation = keystream.get_permutation
+
+        def decode_pin(key_press, pin):
+            return plugboard_pins[get_permutation(key_press)[plugboard_pins[pin]]]
+
+    else:
+        get_halves = keystream.get_halves
+
+        # only the reflector is different, so the signal goes through the same
+        # halves of the route with this enigma machine's reflector in between
+        def decode_pin(key_press, pin):
+            right_to_left, left_to_right = get_halves(key_press)
+            return plugboard_pins[
+                left_to_right[reflector_pins[right_to_left[plugboard_pins[pin]]]]
+            ]
+
+    return decode_pin
+
+
+def decode_if_cribs_can_match(decode_pin, code_pins, crib_checks):
+    """
+    Decodes the code one pin at a time with decode_pin (see get_pin_decoder), giving
+    back None as soon as every possible position of every crib (see get_crib_checks)
+    has a letter that doesn't match. Once one of the cribs has been found, the rest
+    of the code is decoded without any more checks
+    """
+    starts, matches, crib_ends, last_start = crib_checks
+    cribs_left = 0
+    crib_found = False
+    decoded_pins = []
+
+    if last_start < 0:
+        return None
+
+    for i, pin in enumerate(code_pins):
+        decoded_pin = decode_pin(i, pin)
+        decoded_pins.append(decoded_pin)
+
+        if crib_found:
+            continue
+
+        # every crib moves one index further from where it started
+        cribs_left = ((cribs_left << 1) | starts[i]) & matches[decoded_pin]
+
+        if cribs_left & crib_ends:
+            crib_found = True
+        elif not cribs_left and i >= last_start:
+            return None
+
+    return "".join(chr(decoded_pin + 65) for decoded_pin in decoded_pins)
+
+
+# what each worker process needs to crack a code, which is given to it once when
+# it starts (see set_up_worker) so that only ranges of ranks need to be sent to it
+worker_settings = {}
+
+
+def set_up_worker(cribs, code, keyspace, batch_size, max_solutions, sweep_positions):
+    worker_settings["cribs"] = cribs
+    worker_settings["code"] = code
+    worker_settings["keyspace"] = keyspace
+    worker_settings["batch_size"] = batch_size
+    worker_settings["max_solutions"] = max_solutions
+    worker_settings["position_sweeps"] = (
+        PositionSweeps(len(code)) if sweep_positions else None
+    )
+    worker_settings["crib_positions"] = get_crib_positions(cribs, code)
+    worker_settings["crib_checks"] = get_crib_checks(
+        cribs, code, worker_settings["crib_positions"]
+    )
+
+
+def crack_keyspace_range(start, stop):
+    """
+    Checks the range of the worker's keyspace between the start and stop rank
+
+    This is what each worker process runs when cracking codes in parallel
+    """
+    return crack_keyspace(
+        worker_settings["cribs"],
+        worker_settings["code"],
+        worker_settings["keyspace"].get_range(start, stop),
+        worker_settings["batch_size"],
+        worker_settings["max_solutions"],
+        worker_settings["position_sweeps"],
+        worker_settings["crib_checks"],
+        worker_settings["crib_positions"],
+    )
+
+
+def crack_keyspace(
+    cribs,
+    code,
+    keyspace,
+    batch_size=None,
+    max_solutions=None,
+    position_sweeps=None,
+    crib_checks=None,
+    crib_positions=None,
+):
+    """
+    Checks every combination of settings in the keyspace, returning the rank
+    that checking stopped at, how many valid enigma machines were checked and
+    the potential solutions found, along with the rank of their settings
+
+    If max_solutions is given, checking stops as soon as that many potential
+    solutions have been found
+    """
+    number_of_enigma_machines_checked = 0
+
+    def count_enigma_machines_checked(ranked_enigma_machines):
+        nonlocal number_of_enigma_machines_checked
+        for ranked_enigma_machine in ranked_enigma_machines:
+            number_of_enigma_machines_checked += 1
+            yield ranked_enigma_machine
+
+    # every enigma machine in a batch is needed at once, so they can only be
+    # re-keyed in place when they are checked one at a time
+    ranked_enigma_machines = count_enigma_machines_checked(
+        create_valid_enigma_machines(keyspace, reuse_enigma_machine=batch_size is None)
+    )
+    stop = keyspace.stop
+    ranked_potential_solutions = []
+
+    for rank, potential_solution in get_potential_solutions(
+        cribs,
+        code,
+        ranked_enigma_machines,
+        batch_size,
+        position_sweeps,
+        crib_checks,
+        crib_positions,
+    ):
+        ranked_potential_solutions.append((rank, potential_solution))
+
+        if (
+            max_solutions is not None
+            and len(ranked_potential_solutions) >= max_solutions
+        ):
+            stop = rank + 1
+            break
+
+    return stop, number_of_enigma_machines_checked, ranked_potential_solutions
+
+
 def cracking_code_one():
     enigma_code_cracker = EnigmaCodeCracker(
         cribs=["SECRETS"],
@@ -145,6 +755,7 @@ def cracking_code_one():
             {"name": "C"},
         ],
         lead_settings=[["KI", "XN", "FL"]],
+        batch_size=BATCH_SIZE,
     )
 
     enigma_code_cracker.print_potential_solutions()
@@ -159,6 +770,7 @@ def cracking_code_two():
         position_settings=get_potential_position_settings(string.ascii_uppercase, 3),
         reflectors=[{"name": "B"}],
         lead_settings=[["VH", "PT", "ZG", "BJ", "EY", "FS"]],
+        sweep_positions=True,
     )
 
     enigma_code_cracker.print_potential_solutions()
@@ -173,6 +785,7 @@ def cracking_code_three():
         position_settings=[["E", "M", "Y"]],
         reflectors=[{"name": "A"}, {"name": "B"}, {"name": "C"}],
         lead_settings=[["FH", "TS", "BE", "UQ", "KD", "AL"]],
+        batch_size=BATCH_SIZE,
     )
 
     enigma_code_cracker.print_potential_solutions()
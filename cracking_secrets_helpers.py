@@ -3,22 +3,63 @@ from enigma_helpers import *
 import string
 
 
+def get_chunks(iterable, chunk_size):
+    """
+    Lazily splits an iterable into lists of (at most) chunk_size items
+    """
+    iterator = iter(iterable)
+
+    while True:
+        chunk = list(it.islice(iterator, chunk_size))
+        if len(chunk) == 0:
+            return
+
+        yield chunk
+
+
+def get_possible_crib_positions(code, crib):
+    """
+    An enigma machine never encodes a letter to itself, so a crib can't be at any
+    position in the code where one of its letters lines up with the same letter in
+    the code. This returns every position in the code where the crib could be
+    """
+    return [
+        position
+        for position in range(len(code) - len(crib) + 1)
+        if all(
+            code_character != crib_character
+            for code_character, crib_character in zip(code[position:], crib)
+        )
+    ]
+
+
+def get_crib_positions(cribs, code):
+    """
+    Gets every position in the code that each crib could be at (see
+    get_possible_crib_positions)
+    """
+    return {crib: get_possible_crib_positions(code, crib) for crib in cribs}
+
+
 def get_potential_rotor_names(rotor_names_allowed, rotor_length):
-    return list(it.permutations(rotor_names_allowed, rotor_length))
+    return it.permutations(rotor_names_allowed, rotor_length)
 
 
 def get_potential_ring_settings(ring_settings_allowed, rotor_length):
-    return list(it.product(ring_settings_allowed, repeat=rotor_length))
+    return it.product(ring_settings_allowed, repeat=rotor_length)
 
 
 def get_potential_position_settings(position_settings_allowed, rotor_length):
-    return list(it.product(position_settings_allowed, repeat=rotor_length))
+    return it.product(position_settings_allowed, repeat=rotor_length)
 
 
 def get_potential_lead_settings(known_leads, leads_with_one_character):
     """
     This method takes known leads, and any leads where we know what one of the characters is
-    (but we don't know which one it connects to), and returns a list of possible lead settings
+    (but we don't know which one it connects to), and generates the possible lead settings
+
+    The lead settings are given back as an iterator, which a Keyspace reads in full and
+    which can only be used once
     """
     # first get all the letters that we know have been taken on the plugboard and use these
     # to find any letters that we know must be available
@@ -42,11 +83,10 @@ def get_potential_lead_settings(known_leads, leads_with_one_character):
     # [("AZ", "IK"), ("AZ", "AK") etc.]
     # note that in the second tuple, "AZ" and "AK" appear together. If this combination was added
     # to the plugboard then this would not be valid so we filter these out below
-    potential_missing_combinations = list(
-        it.combinations(potential_leads, len(leads_with_one_character))
+    potential_missing_combinations = it.combinations(
+        potential_leads, len(leads_with_one_character)
     )
 
-    potential_lead_settings = []
     for potential_missing_combo in potential_missing_combinations:
         known_leads_copy = known_leads.copy()
         potential_missing_combo_in_string = "".join(potential_missing_combo)
@@ -58,31 +98,22 @@ def get_potential_lead_settings(known_leads, leads_with_one_character):
             for valid_lead in potential_missing_combo:
                 known_leads_copy.append(valid_lead)
 
-            potential_lead_settings.append(known_leads_copy)
-
-    return potential_lead_settings
+            yield known_leads_copy
 
 
 def get_potential_custom_reflector_mappings(standard_reflector_names):
     """
     If there were four pairs of wires that were swapped from a normal reflector
-    then you could use this method to return all the possible reflector mappings
+    then you could use this method to generate all the possible reflector mappings
     that it could have been
-    """
-    potential_custom_reflector_mappings = []
 
+    As with get_potential_lead_settings, the mappings are given back as an iterator,
+    which a Keyspace reads in full and which can only be used once
+    """
     for standard_reflector_name in standard_reflector_names:
-        potential_reflector_mappings_with_swapped_wires = (
-            get_potential_reflector_mappings_with_swapped_wires(standard_reflector_name)
+        yield from get_potential_reflector_mappings_with_swapped_wires(
+            standard_reflector_name
         )
-        for (
-            potential_custom_reflector_mapping
-        ) in potential_reflector_mappings_with_swapped_wires:
-            potential_custom_reflector_mappings.append(
-                potential_custom_reflector_mapping
-            )
-
-    return potential_custom_reflector_mappings
 
 
 def get_potential_reflector_mappings_with_swapped_wires(reflector_name):
@@ -96,10 +127,8 @@ def get_potential_reflector_mappings_with_swapped_wires(reflector_name):
     standard_reflector_pairings = get_standard_reflector_pairings(reflector_mapping)
     four_pairs = list(it.combinations(standard_reflector_pairings, 4))
 
-    potential_reflector_mappings_with_swapped_wires = []
-
     for four_pair in four_pairs:
-        potential_two_pairs_to_swap = list(it.combinations(four_pair, 2))
+        potential_two_pairs_to_swap = it.combinations(four_pair, 2)
         for first_two_pairs in potential_two_pairs_to_swap:
             second_two_pairs = list(set(four_pair) - set(first_two_pairs))
 
@@ -122,19 +151,15 @@ def get_potential_reflector_mappings_with_swapped_wires(reflector_name):
             for (
                 potential_reflector_mapping
             ) in four_potential_reflector_mappings_in_pairs:
-                potential_reflector_mappings_with_swapped_wires.append(
-                    {
-                        "name": "Custom",
-                        "custom_reflector_mapping": {
-                            "original_reflector_name": reflector_name,
-                            "mapping": convert_reflector_pairs_to_reflector_mapping(
-                                potential_reflector_mapping
-                            ),
-                        },
-                    }
-                )
-
-    return potential_reflector_mappings_with_swapped_wires
+                yield {
+                    "name": "Custom",
+                    "custom_reflector_mapping": {
+                        "original_reflector_name": reflector_name,
+                        "mapping": convert_reflector_pairs_to_reflector_mapping(
+                            potential_reflector_mapping
+                        ),
+                    },
+                }
 
 
 def get_standard_reflector_pairings(reflector_definition):
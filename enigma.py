@@ -1,5 +1,34 @@
 from errors import *
 from enigma_helpers import *
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from keystream import *
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# the number of characters that each worker encodes at a time when a string is
+# encoded in parallel (see EnigmaMachine.encode_in_parallel)
+DEFAULT_ENCODING_CHUNK_SIZE = 1024 * 1024
+# bytes shorter than this are sent through the rotors a character at a time rather
+# than compiling a KeystreamTable for them, since compiling one takes about as long
+# as encoding this many characters
+MINIMUM_LENGTH_FOR_KEYSTREAM_TABLE = 64 * 1024
+# the number of bytes that encode_bytes works on at a time
+BYTES_BLOCK_SIZE = 1024 * 1024
+LOWERCASE_LETTERS = bytes(range(97, 123))
+# turns the pins in a KeystreamTable into the letters they stand for
+LETTERS_FOR_PINS = bytes.maketrans(bytes(range(26)), UPPERCASE_LETTERS)
+# the pin for every byte that is a letter (in either case) and -1 for every other
+# byte
+PINS_FOR_BYTES = [
+    (byte & ~32) - 65 if chr(byte).isascii() and chr(byte).isalpha() else -1
+    for byte in range(256)
+]
+NON_LETTERS = bytes(byte for byte in range(256) if PINS_FOR_BYTES[byte] < 0)
 
 
 class Plugboard:
@@ -10,41 +39,75 @@ class Plugboard:
     through the plug leads. It is also used to validate whether all the characters within
     the plug leads are unique and, also, limits the number of plug leads allowed in the
     enigma machine
+
+    Rather than holding on to the plug leads themselves, the plugboard keeps the pin
+    that each pin (0 is A and 25 is Z) is swapped with, so encoding a character is a
+    single lookup, along with a bitmask of the pins that already have a lead, so a
+    lead can be checked and added without looking at any of the others. The plug
+    leads can still be seen through leads
     """
 
+    __slots__ = ("swapped_pins", "pins_with_leads", "lead_pins")
+
     def __init__(self):
-        self.leads = []
+        self.swapped_pins = bytearray(range(26))
+        self.pins_with_leads = 0
+        # the first pin of every lead, in the order they were added
+        self.lead_pins = bytearray()
+
+    @property
+    def leads(self):
+        return tuple(
+            PlugLead(chr(pin + 65) + chr(self.swapped_pins[pin] + 65))
+            for pin in self.lead_pins
+        )
 
     def encode(self, char):
-        for lead in self.leads:
-            encoded_char = lead.encode(char)
-            if encoded_char != char:
-                return encoded_char
+        pin = ord(char) - 65
+        if 0 <= pin < 26:
+            return chr(self.swapped_pins[pin] + 65)
 
         return char
 
     def add(self, PlugLead):
-        if len(self.leads) > 10:
+        if len(self.lead_pins) > 10:
             raise PlugboardError("You are not allowed to add more than 10 leads")
 
-        for lead in self.leads:
-            if (
-                lead.characters[0] in PlugLead.characters
-                or lead.characters[1] in PlugLead.characters
-            ):
-                raise PlugboardError(
-                    "You tried to add a lead to the plugboard which has one of its letters already taken",
-                    lead.characters,
-                    self.leads,
-                )
+        first_pin, second_pin = (ord(char) - 65 for char in PlugLead.characters)
+        lead_bitmask = (1 << first_pin) | (1 << second_pin)
+
+        if self.pins_with_leads & lead_bitmask:
+            raise PlugboardError(
+                "You tried to add a lead to the plugboard which has one of its letters already taken",
+                PlugLead.characters,
+                self.leads,
+            )
+
+        self.swapped_pins[first_pin] = second_pin
+        self.swapped_pins[second_pin] = first_pin
+        self.pins_with_leads |= lead_bitmask
+        self.lead_pins.append(first_pin)
 
-        self.leads.append(PlugLead)
+    def clear(self):
+        """
+        Takes every lead out of the plugboard
+        """
+        self.swapped_pins[:] = range(26)
+        self.pins_with_leads = 0
+        self.lead_pins.clear()
+
+    def get_pins(self):
+        """
+        Gets the pin that each pin (0 is A and 25 is Z) is swapped with, so the
+        plugboard can be applied to pins with a single lookup
+        """
+        return list(self.swapped_pins)
 
     def __str__(self):
-        return f"{self.leads}"
+        return f"{list(self.leads)}"
 
     def __repr__(self):
-        return f"{self.leads}"
+        return f"{list(self.leads)}"
 
 
 class PlugLead:
@@ -57,6 +120,8 @@ class PlugLead:
     with the opposite character (in this example it would be 'E')
     """
 
+    __slots__ = ("characters",)
+
     def __init__(self, mapping):
         if len(mapping) != 2:
             raise PlugLeadError("You must add 2 values to the PlugLead")
@@ -95,6 +160,8 @@ class Reflector:
     'reflects' it back to the same rotor
     """
 
+    __slots__ = ("name", "mapping")
+
     def __init__(self, reflector_name):
         self.name = reflector_name
         self.mapping = get_standard_reflector_mapping(reflector_name)
@@ -104,6 +171,13 @@ class Reflector:
 
         return ord(reflected_char) - 65
 
+    def get_pins(self):
+        """
+        Gets the pin that each pin is reflected to, so the reflector can be applied
+        to pins with a single lookup
+        """
+        return [ord(reflected_char) - 65 for reflected_char in self.mapping]
+
     def __str__(self):
         return f"{self.name}"
 
@@ -117,10 +191,18 @@ class CustomReflector(Reflector):
     standard Reflector
     """
 
+    __slots__ = ("original_reflector_name",)
+
     def __init__(self, mapping, original_reflector_name):
         if len(mapping) != 26:
             raise ReflectorError("The custom reflector mapping must be 26 letters long")
 
+        if not is_valid_reflector_mapping(mapping):
+            raise ReflectorError(
+                "The custom reflector mapping must pair every uppercase letter with a "
+                "different letter"
+            )
+
         self.name = "Custom"
         self.mapping = mapping
         self.original_reflector_name = original_reflector_name
@@ -149,6 +231,17 @@ class Rotor:
     for more details)
     """
 
+    __slots__ = (
+        "name",
+        "mapping",
+        "notch",
+        "position",
+        "ring_setting",
+        "initial_position",
+        "right_to_left_tables",
+        "left_to_right_tables",
+    )
+
     def __init__(self, name, position_setting="A", ring_setting=1):
         rotor_setting = get_rotor_mappings(name)
         self.name = name
@@ -157,10 +250,20 @@ class Rotor:
         self.position = ord(position_setting) - 65
         self.ring_setting = ring_setting - 1
         self.initial_position = position_setting
+        (
+            self.right_to_left_tables,
+            self.left_to_right_tables,
+        ) = get_rotor_offset_tables(self.mapping)
 
     def step(self):
         self.position = self.position + 1 if self.position != 25 else 0
 
+    def reset(self):
+        """
+        Puts the rotor back to the position it was set to when it was created
+        """
+        self.position = ord(self.initial_position) - 65
+
     def encode_from_right_to_left(self, initial_pin):
         """
         Mimics the behaviour of how a rotor receives a signal on its right side.
@@ -172,22 +275,14 @@ class Rotor:
         the signal takes through the internal wiring is determined by the
         difference between its current position and the ring setting, which is
         the offset
+
+        The route for every offset is precomputed (see get_rotor_offset_tables),
+        so we only need to look up the table for the current offset and find the
+        exit contact for the pin
         """
-        offset = self.__get_offset__()
-        # whatever contact is at the adjusted pin index will have a
-        # corresponding exit contact, which is where the signal will exit
-        # the rotor from from the left hand side
-        adjusted_pin_index = (initial_pin + offset) % 26
-        # we find the offset exit contact by first finding what the position
-        # of the contact would be if the internal wiring hadn't changed (i.e
-        # if the position and ring setting hadn't been adjusted), and then use
-        # the offset (which is the difference between the current position and
-        # the ring setting) to determine which contact the signal will exit
-        # from out of the rotor
-        label_index = ord(self.mapping[adjusted_pin_index]) - 65
-        exit_contact = (label_index - offset) % 26
-
-        return exit_contact
+        offset = self.__get_offset__() % 26
+
+        return self.right_to_left_tables[offset][initial_pin]
 
     def encode_from_left_to_right(self, first_contact):
         """
@@ -199,23 +294,14 @@ class Rotor:
         through a pin on its right hand side (exit_pin). The route the signal
         takes through the internal wiring is determined by the difference between
         its current position and the ring setting, which is the offset
+
+        As with encode_from_right_to_left, this is a lookup into the precomputed
+        table for the current offset, which is the inverse of the right to left
+        table
         """
-        offset = self.__get_offset__()
-        # when the signal enters the rotor from the left, it will first hit a
-        # contact, which will be adjusted according to the rotor's current
-        # position and ring setting
-        adjusted_contact = (first_contact + offset) % 26
-        # we then need to get that character and then find it within the
-        # the mapping in order to pass the signal from the left hand side to
-        # the right hand side
-        char_from_contact = chr(65 + adjusted_contact)
-        pin_index = self.mapping.index(char_from_contact)
-        # and we adjust the exit pin because we want to make sure that it hits
-        # the correct adjusted contact on the rotor to the right hand side, or
-        # the plugboard
-        exit_pin = (pin_index - offset) % 26
+        offset = self.__get_offset__() % 26
 
-        return exit_pin
+        return self.left_to_right_tables[offset][first_contact]
 
     def __get_offset__(self):
         """
@@ -245,21 +331,33 @@ class RotorCradle:
     what is needed to encode a text in an enigma machine
     """
 
+    __slots__ = ("rotors", "reflector", "compiled_permutations", "keystream_table")
+
     def __init__(self):
         self.rotors = []
         self.reflector = None
+        # compiled substitutions for every combination of rotor positions that the
+        # rotors have been in, see get_permutation
+        self.compiled_permutations = {}
+        # an optional KeystreamTable (see keystream.py) holding the substitutions
+        # for every state the rotors can be in
+        self.keystream_table = None
 
     def add_rotor(self, Rotor):
         if len(self.rotors) >= 4:
             raise RotorCradleError("You are allowed a maximum of 4 rotors")
 
         self.rotors.append(Rotor)
+        self.compiled_permutations = {}
+        self.keystream_table = None
 
     def add_reflector(self, Reflector):
         if self.reflector != None:
             raise RotorCradleError("You are only allowed one reflector")
 
         self.reflector = Reflector
+        self.compiled_permutations = {}
+        self.keystream_table = None
 
     def step_rotors(self):
         """
@@ -281,14 +379,199 @@ class RotorCradle:
             elif first_rotor:
                 rotor.step()
 
-    def encode(self, input_character):
+    def advance(self, number_of_key_presses):
         """
-        Steps rotors and then encodes a character from the right hand side of the
-        rotor cradle to the left and then back again
+        Moves the rotors to the positions they would be in after
+        number_of_key_presses key presses, without stepping them one at a time
+
+        The right most rotor always steps, so it just moves on by
+        number_of_key_presses. The middle rotor steps every time the right most
+        rotor is on its notch (a trigger), which happens every 26 key presses from
+        the first time it reaches it, and the middle rotor also steps on its own
+        when it is on its notch (the double step), which is the only time the left
+        most rotor steps. The middle rotor can only get onto its notch because of a
+        trigger (once we have dealt with it starting on its notch), and the double
+        step always happens on the very next key press, taking it straight off its
+        notch again. So, after d triggers (where d is how far the middle rotor is
+        from its notch) and every 25 triggers after that, there is a double step,
+        unless the trigger happened on the last key press
         """
-        self.step_rotors()
-        pin_to_connect_to = ord(input_character) - 65
+        if number_of_key_presses < 0:
+            raise RotorCradleError("The rotors can only be advanced forwards")
+
+        if number_of_key_presses == 0 or len(self.rotors) == 0:
+            return
+
+        if len(self.rotors) > 1 and self.rotors[1].is_on_notch():
+            self.step_rotors()
+            number_of_key_presses -= 1
+
+        right_rotor = self.rotors[0]
+
+        triggers = 0
+        if right_rotor.notch != -1:
+            first_trigger = (right_rotor.notch - right_rotor.position) % 26
+            if number_of_key_presses > first_trigger:
+                triggers = (number_of_key_presses - 1 - first_trigger) // 26 + 1
+
+        double_steps = 0
+        if len(self.rotors) > 1 and self.rotors[1].notch != -1 and triggers > 0:
+            middle_rotor = self.rotors[1]
+            triggers_to_notch = (middle_rotor.notch - middle_rotor.position) % 26
+
+            if triggers >= triggers_to_notch:
+                double_steps = 1 + (triggers - triggers_to_notch) // 25
+                last_trigger_onto_notch = triggers_to_notch + 25 * (double_steps - 1)
+                last_trigger_onto_notch_key_press = first_trigger + 26 * (
+                    last_trigger_onto_notch - 1
+                )
+                if last_trigger_onto_notch_key_press == number_of_key_presses - 1:
+                    double_steps -= 1
+
+        right_rotor.position = (right_rotor.position + number_of_key_presses) % 26
+        if len(self.rotors) > 1:
+            self.rotors[1].position = (
+                self.rotors[1].position + triggers + double_steps
+            ) % 26
+        if len(self.rotors) > 2:
+            self.rotors[2].position = (self.rotors[2].position + double_steps) % 26
+
+    def reset(self):
+        """
+        Puts every rotor back to the position it was set to when it was created
+        """
+        for rotor in self.rotors:
+            rotor.reset()
+
+    def set_positions(self, position_settings):
+        """
+        Sets the position of every rotor (from right to left, like rotors) and puts
+        them there
+
+        The substitutions compiled so far are for tuples of rotor positions, so they
+        can all still be used. They (and the keystream table) are only thrown away
+        if the position of a rotor that never steps changes, since stepping can't
+        bring the rotors back to any of those positions
+        """
+        for i, (rotor, position_setting) in enumerate(
+            zip(self.rotors, position_settings)
+        ):
+            if (
+                i >= NUMBER_OF_STEPPING_ROTORS
+                and rotor.initial_position != position_setting
+            ):
+                self.compiled_permutations = {}
+                self.keystream_table = None
+
+            rotor.initial_position = position_setting
+            rotor.position = ord(position_setting) - 65
+
+    def set_rings(self, ring_settings):
+        """
+        Sets the ring setting of every rotor (from right to left, like rotors),
+        throwing away the substitutions compiled so far if any of them change
+        """
+        for rotor, ring_setting in zip(self.rotors, ring_settings):
+            ring_setting = int(ring_setting) - 1
+
+            if rotor.ring_setting != ring_setting:
+                rotor.ring_setting = ring_setting
+                self.compiled_permutations = {}
+                self.keystream_table = None
+
+    def copy(self):
+        """
+        Gets a rotor cradle with the same rotors in the same positions, which can be
+        stepped without moving the rotors of this one. The reflector and keystream
+        table never change, so they are shared rather than copied
+        """
+        rotor_cradle = RotorCradle()
+
+        for rotor in self.rotors:
+            rotor_copy = Rotor(
+                rotor.name,
+                position_setting=rotor.initial_position,
+                ring_setting=rotor.ring_setting + 1,
+            )
+            rotor_copy.position = rotor.position
+            rotor_cradle.rotors.append(rotor_copy)
+
+        rotor_cradle.reflector = self.reflector
+        rotor_cradle.keystream_table = self.keystream_table
+
+        return rotor_cradle
+
+    def get_rotor_positions(self):
+        return tuple([rotor.position for rotor in self.rotors])
+
+    def get_permutation(self):
+        """
+        Gets the substitution that the rotors and reflector apply in their current
+        positions
+
+        Since the rotors only ever change position (the ring settings, the rotors
+        themselves and the reflector are fixed once they are in the cradle), the
+        substitution for a given tuple of rotor positions never changes. We compile
+        it the first time it is asked for and reuse it every time the rotors come
+        back to the same positions
+
+        If the rotor cradle has a keystream table, the substitutions for every state
+        have already been compiled and we look them up there instead
+        """
+        rotor_positions = self.get_rotor_positions()
+
+        if self.keystream_table is not None:
+            return self.keystream_table.get_permutation(rotor_positions)
+
+        permutation = self.compiled_permutations.get(rotor_positions)
+
+        if not isinstance(permutation, tuple):
+            permutation = self.__compile_permutation__(permutation)
+            self.compiled_permutations[rotor_positions] = permutation
+
+        return permutation
+
+    def get_keystream(self, number_of_key_presses):
+        """
+        Steps the rotors number_of_key_presses times, giving back the substitution
+        that the rotor cradle applies after each step
+
+        The substitutions don't depend on the plugboard, so when lots of plugboards
+        are tried with the same rotor settings (see PlugboardHillClimber), they
+        only need to be worked out once
+        """
+        keystream = []
+
+        for _ in range(number_of_key_presses):
+            self.step_rotors()
+            keystream.append(self.get_permutation())
+
+        return keystream
+
+    def __compile_permutation__(self, partial_permutation=None):
+        """
+        Collapses the route through every rotor, the reflector, and back through
+        every rotor into a single 26 entry table, where the index is the pin a
+        signal enters the rotor cradle on and the value is the pin it exits from
+
+        Any pins that encode has already sent through the rotors in these positions
+        (partial_permutation) don't need to be sent through again
+        """
+        permutation = partial_permutation or [None] * 26
+
+        for pin in range(26):
+            if permutation[pin] is None:
+                exit_pin = self.__send_signal__(pin)
+                permutation[pin] = exit_pin
+                permutation[exit_pin] = pin
 
+        return tuple(permutation)
+
+    def __send_signal__(self, pin_to_connect_to):
+        """
+        Sends a signal from a pin on the right hand side of the rotor cradle through
+        every rotor to the reflector, and back through every rotor again
+        """
         for rotor in self.rotors:
             pin_to_connect_to = rotor.encode_from_right_to_left(pin_to_connect_to)
 
@@ -299,10 +582,55 @@ class RotorCradle:
                 contact_to_connect_to
             )
 
-        input_character_encrypted = chr(contact_to_connect_to + 65)
+        return contact_to_connect_to
+
+    def encode(self, input_character):
+        """
+        Steps rotors and then encodes a character from the right hand side of the
+        rotor cradle to the left and then back again
+
+        Most of the time the rotors will only be in a given position for a single
+        character, so rather than compiling the whole substitution for every
+        position, we only send the character we need through the rotors and keep
+        the result in a partially compiled substitution. Because the signal is
+        reflected back along the same rotors, the substitution is an involution
+        (if A is encoded to G then G is encoded to A), so every signal we send fills
+        in two entries
+        """
+        exit_pin = self.encode_pin(ord(input_character) - 65)
+
+        input_character_encrypted = chr(exit_pin + 65)
 
         return input_character_encrypted
 
+    def encode_pin(self, pin):
+        """
+        The same as encode, but takes and returns a pin (0 is A and 25 is Z) rather
+        than a character, so strings that have already been turned into pins can be
+        encoded without converting every character back and forth
+        """
+        self.step_rotors()
+        rotor_positions = self.get_rotor_positions()
+
+        if self.keystream_table is not None:
+            permutation = self.keystream_table.get_permutation(rotor_positions)
+            return permutation[pin]
+
+        permutation = self.compiled_permutations.get(rotor_positions)
+
+        if permutation is None:
+            permutation = [None] * 26
+            self.compiled_permutations[rotor_positions] = permutation
+
+        exit_pin = permutation[pin]
+
+        if exit_pin is None:
+            exit_pin = self.__send_signal__(pin)
+            permutation[pin] = exit_pin
+            permutation[exit_pin] = pin
+
+        return exit_pin
+
     def __str__(self):
         return f"{self.rotors} {self.reflector}"
 
@@ -317,6 +645,8 @@ class EnigmaMachine:
     EnigmaMachine houses a plugboard and rotor cradle (see Plugboard and RotorCradle)
     """
 
+    __slots__ = ("plugboard", "rotor_cradle")
+
     def __init__(self, Plugboard, RotorCradle):
         if len(RotorCradle.rotors) < 3 or len(RotorCradle.rotors) > 4:
             raise EnigmaMachineError(
@@ -331,21 +661,339 @@ class EnigmaMachine:
         encodes a string in the enigma machine by passing it through the plugboard first,
         then through the rotors and reflector in the rotor cradle, before finally
         passing it back through the plugboard
+
+        Every string is encoded from the positions the rotors were set to, so
+        encoding one string doesn't change how the next one is encoded. To encode a
+        message that arrives a piece at a time, use an encoder (see encoder)
         """
         if not is_valid_enigma_input_string(string):
             raise EnigmaMachineError(
                 "Input must be uppercase letters of the alphabet only with no spaces"
             )
 
+        self.rotor_cradle.reset()
+
         encoded_string = []
         for character in string:
-            plugboard_output = self.plugboard.encode(character)
-            rotor_cradle_output = self.rotor_cradle.encode(plugboard_output)
-
-            encoded_string.append(self.plugboard.encode(rotor_cradle_output))
+            encoded_string.append(self.encode_character(character))
 
         return "".join(encoded_string)
 
+    def encode_many(self, messages):
+        """
+        Encodes every message in a list in the same way as encode (i.e each of them
+        from the positions the rotors were set to), giving back a list of the
+        encoded messages
+
+        Every message goes through the same substitutions at the same index, so
+        rather than sending every message through the rotors, the substitution at
+        each index (with the plugboard applied on both sides) is worked out once, up
+        to the length of the longest message. If NumPy is installed, the messages
+        are then put into the rows of a 2-D array and each column is encoded with a
+        single lookup into the substitution for its index, otherwise each message is
+        encoded with a lookup per character
+        """
+        for message in messages:
+            if not is_valid_enigma_input_string(message):
+                raise EnigmaMachineError(
+                    "Input must be uppercase letters of the alphabet only with no spaces"
+                )
+
+        lengths = [len(message) for message in messages]
+        maximum_length = max(lengths, default=0)
+        plugboard_pins = self.plugboard.get_pins()
+
+        self.rotor_cradle.reset()
+        keystream = [
+            [
+                plugboard_pins[permutation[plugboard_pin]]
+                for plugboard_pin in plugboard_pins
+            ]
+            for permutation in self.rotor_cradle.get_keystream(maximum_length)
+        ]
+
+        if np is None or not messages:
+            return [
+                "".join(
+                    chr(permutation[ord(character) - 65] + 65)
+                    for permutation, character in zip(keystream, message)
+                )
+                for message in messages
+            ]
+
+        # shorter messages are padded out to the length of the longest one, and
+        # the padding is cut off again once every message has been encoded
+        padded_messages = b"".join(
+            message.encode("ascii").ljust(maximum_length, b"A") for message in messages
+        )
+        pins = (
+            np.frombuffer(padded_messages, dtype=np.uint8).reshape(
+                len(messages), maximum_length
+            )
+            - 65
+        )
+        keystream = np.array(keystream, dtype=np.uint8).reshape(maximum_length, 26)
+        encoded_messages = (keystream[np.arange(maximum_length), pins] + 65).tobytes()
+
+        return [
+            encoded_messages[i * maximum_length : i * maximum_length + length].decode(
+                "ascii"
+            )
+            for i, length in enumerate(lengths)
+        ]
+
+    def encode_in_parallel(
+        self, string, workers=None, chunk_size=DEFAULT_ENCODING_CHUNK_SIZE
+    ):
+        """
+        Encodes a (very long) string in the same way as encode (from the positions
+        the rotors were set to), but splits it into
+        chunks of chunk_size characters that are encoded by worker processes at the
+        same time. See encode_chunks_in_parallel
+        """
+        return "".join(self.encode_chunks_in_parallel(string, workers, chunk_size))
+
+    def encode_chunks_in_parallel(
+        self, string, workers=None, chunk_size=DEFAULT_ENCODING_CHUNK_SIZE
+    ):
+        """
+        Lazily encodes a string chunk_size characters at a time across workers
+        worker processes (one per CPU by default), giving back the encoded chunks in
+        order, so they can be written out as they arrive
+
+        Like encode, the string is encoded from the positions the rotors were set
+        to. Every worker is given a copy of the enigma machine once when it starts
+        (see set_up_encoding_worker), and for each chunk it jumps the rotors ahead
+        to where they would be at the start of the chunk (see RotorCradle.advance),
+        so no chunk has to wait for the one before it. Only a few chunks per worker are
+        sent at a time, so we never hold on to much more than that many chunks
+
+        The string is checked and the rotors are put back to where they were set as
+        soon as this is called, rather than when the first chunk is asked for. When
+        the chunks stop being asked for (whether every chunk has been given back or
+        not), the rotors of this enigma machine are moved to where encode would have
+        left them after encoding the chunks given back so far
+        """
+        if not is_valid_enigma_input_string(string):
+            raise EnigmaMachineError(
+                "Input must be uppercase letters of the alphabet only with no spaces"
+            )
+
+        if workers is not None and workers < 1:
+            raise EnigmaMachineError("The number of workers must be at least 1")
+
+        if chunk_size < 1:
+            raise EnigmaMachineError("The chunk size must be at least 1")
+
+        self.rotor_cradle.reset()
+
+        return self.__encode_chunks_in_parallel__(string, workers, chunk_size)
+
+    def __encode_chunks_in_parallel__(self, string, workers, chunk_size):
+        number_of_characters_encoded = 0
+
+        try:
+            # the copy leaves behind the substitutions compiled so far, which would
+            # otherwise be pickled for every worker
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=set_up_encoding_worker,
+                initargs=(self.copy(),),
+            ) as executor:
+                chunks_being_encoded = deque()
+                maximum_chunks_being_encoded = 2 * (workers or os.cpu_count() or 1)
+
+                try:
+                    for start in range(0, len(string), chunk_size):
+                        chunks_being_encoded.append(
+                            executor.submit(
+                                encode_chunk,
+                                start,
+                                string[start : start + chunk_size],
+                            )
+                        )
+
+                        if len(chunks_being_encoded) >= maximum_chunks_being_encoded:
+                            encoded_chunk = chunks_being_encoded.popleft().result()
+                            number_of_characters_encoded += len(encoded_chunk)
+                            yield encoded_chunk
+
+                    while chunks_being_encoded:
+                        encoded_chunk = chunks_being_encoded.popleft().result()
+                        number_of_characters_encoded += len(encoded_chunk)
+                        yield encoded_chunk
+                finally:
+                    for chunk_being_encoded in chunks_being_encoded:
+                        chunk_being_encoded.cancel()
+        finally:
+            self.seek(number_of_characters_encoded)
+
+    def encode_bytes(self, data, output=None):
+        """
+        Encodes bytes (or anything that acts like them, i.e a bytearray or mmap) in
+        the same way as encode, writing the encoded bytes into output (which must be
+        writable and at least as long as data) or into a new bytearray
+
+        Unlike encode, this carries on from wherever the rotors are (so it can be
+        used after seek, or a piece of a message at a time), and it works on any
+        bytes: letters in either case are encoded
+        (and keep their case), and every other byte is copied over as it is without
+        stepping the rotors. The bytes are worked on BYTES_BLOCK_SIZE at a time with
+        integer tables rather than as characters, so very large files can be encoded
+        through an mmap without reading them into memory first
+
+        The plugboard never changes, so it is applied to a whole block at once before
+        and after the rotors with bytes.translate. Long inputs go through every state
+        the rotors can be in many times over, so rather than sending each letter
+        through the rotors, the substitutions for every state are compiled into a
+        KeystreamTable first, which is kept on the rotor cradle for next time (unless
+        it already has one), and each letter is then encoded by following next_states
+        and looking up its substitution
+        """
+        if output is None:
+            output = bytearray(len(data))
+
+        if len(output) < len(data):
+            raise EnigmaMachineError("The output must be at least as long as the input")
+
+        rotor_cradle = self.rotor_cradle
+        plugboard_letters = bytes(pin + 65 for pin in self.plugboard.get_pins())
+        plugboard_table = bytes.maketrans(
+            UPPERCASE_LETTERS + LOWERCASE_LETTERS,
+            plugboard_letters + plugboard_letters.lower(),
+        )
+
+        # the keystream table is kept on the rotor cradle, so encoding the next piece
+        # of a message (e.g with an EnigmaEncoder) doesn't compile it again
+        keystream_table = rotor_cradle.keystream_table
+        if keystream_table is None and len(data) >= MINIMUM_LENGTH_FOR_KEYSTREAM_TABLE:
+            keystream_table = KeystreamTable(rotor_cradle)
+            rotor_cradle.keystream_table = keystream_table
+
+        if keystream_table is not None:
+            next_states = keystream_table.next_states
+            encoded_letters = keystream_table.permutations.translate(LETTERS_FOR_PINS)
+            state_index = get_state_index(rotor_cradle.get_rotor_positions())
+            number_of_letters = 0
+
+        for start in range(0, len(data), BYTES_BLOCK_SIZE):
+            block = bytes(data[start : start + BYTES_BLOCK_SIZE]).translate(
+                plugboard_table
+            )
+            encoded_block = bytearray(block)
+
+            for i, byte in enumerate(block):
+                pin = PINS_FOR_BYTES[byte]
+                if pin < 0:
+                    continue
+
+                if keystream_table is not None:
+                    state_index = next_states[state_index]
+                    encoded_letter = encoded_letters[state_index * 26 + pin]
+                    number_of_letters += 1
+                else:
+                    encoded_letter = rotor_cradle.encode_pin(pin) + 65
+
+                # lowercase letters are 32 after their uppercase letter
+                encoded_block[i] = encoded_letter | (byte & 32)
+
+            output[start : start + len(block)] = encoded_block.translate(
+                plugboard_table
+            )
+
+        if keystream_table is not None:
+            rotor_cradle.advance(number_of_letters)
+
+        return output
+
+    def reset(self):
+        """
+        Puts every rotor back to the position it was set to
+        """
+        self.rotor_cradle.reset()
+
+    def set_positions(self, position_settings):
+        """
+        Changes the position settings of the rotors (in the same order as
+        EnigmaMachineFactory takes them) and puts the rotors there, keeping
+        everything that has been compiled for the rotors so far
+
+        Along with set_rings and set_plugboard, this means one enigma machine can be
+        re-keyed for every combination of settings being tried, rather than creating
+        a new one with EnigmaMachineFactory each time
+        """
+        self.rotor_cradle.set_positions(
+            self.__get_settings_for_rotors__(position_settings)
+        )
+
+    def set_rings(self, ring_settings):
+        """
+        Changes the ring settings of the rotors (in the same order as
+        EnigmaMachineFactory takes them)
+        """
+        self.rotor_cradle.set_rings(self.__get_settings_for_rotors__(ring_settings))
+
+    def set_plugboard(self, lead_settings):
+        """
+        Takes every lead out of the plugboard and puts in the leads in lead_settings
+        """
+        self.plugboard.clear()
+
+        for lead_setting in lead_settings:
+            self.plugboard.add(PlugLead(lead_setting))
+
+    def copy(self):
+        """
+        Gets an enigma machine with the same settings and its rotors in the same
+        positions, which won't change when this one is re-keyed or encodes anything
+        """
+        plugboard = Plugboard()
+        plugboard.swapped_pins[:] = self.plugboard.swapped_pins
+        plugboard.pins_with_leads = self.plugboard.pins_with_leads
+        plugboard.lead_pins[:] = self.plugboard.lead_pins
+
+        return EnigmaMachine(plugboard, self.rotor_cradle.copy())
+
+    def __get_settings_for_rotors__(self, settings):
+        """
+        Settings are given in the order the rotors appear in the rotor cradle in
+        real life, which is the reverse of the order the signal goes through them
+        """
+        settings = list(settings)
+
+        if len(settings) != len(self.rotor_cradle.rotors):
+            raise EnigmaMachineError("You must give a setting for every rotor")
+
+        return reversed(settings)
+
+    def encoder(self):
+        """
+        Gets an EnigmaEncoder that encodes a message a chunk at a time, starting from
+        the positions the rotors were set to
+        """
+        return EnigmaEncoder(self)
+
+    def seek(self, number_of_key_presses):
+        """
+        Puts the rotors where they would be after number_of_key_presses characters
+        have been encoded from the start of a message, so encoding (with
+        encode_bytes or encode_character) can carry on from any point in a message
+        without encoding everything before it
+        """
+        self.rotor_cradle.reset()
+        self.rotor_cradle.advance(number_of_key_presses)
+
+    def encode_character(self, character):
+        """
+        encodes a single character, stepping the rotors as it goes. Unlike encode,
+        this doesn't check that the character is valid, so that characters from a
+        string that has already been checked can be encoded one at a time
+        """
+        plugboard_output = self.plugboard.encode(character)
+        rotor_cradle_output = self.rotor_cradle.encode(plugboard_output)
+
+        return self.plugboard.encode(rotor_cradle_output)
+
     def __str__(self):
         rotors = " ".join([str(rotor) for rotor in reversed(self.rotor_cradle.rotors)])
         reflector = self.rotor_cradle.reflector
@@ -361,6 +1009,60 @@ class EnigmaMachine:
         return f"{rotors} {reflector} {plugboard}"
 
 
+class EnigmaEncoder:
+    """
+    Encodes a message that arrives a chunk at a time (e.g from a file or a socket),
+    giving back each encoded chunk as soon as it is encoded, so the whole message
+    never needs to be held in memory
+
+    Chunks can be str or bytes, and each encoded chunk is given back as the same
+    type. Like EnigmaMachine.encode_bytes, letters in either case are encoded and
+    everything else is passed through without stepping the rotors, so a message can
+    be split into chunks anywhere
+
+    The encoder only keeps count of the key presses so far, and moves the rotors of
+    the enigma machine to the right place (see EnigmaMachine.seek) before encoding
+    each chunk. This means the enigma machine can still be used for other messages
+    in between chunks, and reset can start the message again from the beginning
+    """
+
+    __slots__ = ("enigma_machine", "number_of_key_presses")
+
+    def __init__(self, enigma_machine):
+        self.enigma_machine = enigma_machine
+        self.number_of_key_presses = 0
+
+    def encode(self, chunk):
+        if isinstance(chunk, str):
+            return self.encode(chunk.encode("utf-8")).decode("utf-8")
+
+        self.enigma_machine.seek(self.number_of_key_presses)
+        encoded_chunk = bytes(self.enigma_machine.encode_bytes(chunk))
+        self.number_of_key_presses += len(bytes(chunk).translate(None, NON_LETTERS))
+
+        return encoded_chunk
+
+    def encode_chunks(self, chunks):
+        """
+        Lazily encodes every chunk from an iterable (e.g a file opened in binary mode,
+        or a generator of chunks read from a socket)
+        """
+        for chunk in chunks:
+            yield self.encode(chunk)
+
+    def reset(self):
+        """
+        Starts the message again from the positions the rotors were set to
+        """
+        self.number_of_key_presses = 0
+
+    def __str__(self):
+        return f"EnigmaEncoder({self.enigma_machine}) at {self.number_of_key_presses}"
+
+    def __repr__(self):
+        return f"EnigmaEncoder({self.enigma_machine}) at {self.number_of_key_presses}"
+
+
 class EnigmaMachineFactory:
     """
     Creates an enigma machine from preconfigured settings
@@ -373,7 +1075,13 @@ class EnigmaMachineFactory:
         reflector_name=None,
         custom_reflector_mapping=None,
         lead_settings=[],
+        keystream_cache=None,
     ):
+        """
+        keystream_cache is an optional KeystreamCache (see keystream.py). When it is
+        given, enigma machines with the same rotors, ring settings and reflector share
+        the substitutions for every rotor position, so they only get compiled once
+        """
         rotor_cradle = RotorCradle()
         plugboard = Plugboard()
 
@@ -412,6 +1120,11 @@ class EnigmaMachineFactory:
 
         rotor_cradle.add_reflector(reflector)
 
+        if keystream_cache is not None:
+            rotor_cradle.keystream_table = keystream_cache.get_keystream_table(
+                rotor_cradle
+            )
+
         for lead_setting in lead_settings:
             lead = PlugLead(lead_setting)
             plugboard.add(lead)
@@ -419,3 +1132,28 @@ class EnigmaMachineFactory:
         enigma_machine = EnigmaMachine(plugboard, rotor_cradle)
 
         return enigma_machine
+
+
+# the enigma machine each worker process encodes chunks of a string with, which is
+# given to it once when it starts (see set_up_encoding_worker) so that only the
+# chunks need to be sent to it
+encoding_worker_settings = {}
+
+
+def set_up_encoding_worker(enigma_machine):
+    encoding_worker_settings["enigma_machine"] = enigma_machine
+
+
+def encode_chunk(key_presses, chunk):
+    """
+    Encodes a chunk of a string that starts key_presses characters after the
+    positions the rotors of the worker's enigma machine were set to
+
+    This is what each worker process runs when encoding a string in parallel. The
+    worker keeps its enigma machine between chunks, so the KeystreamTable that
+    encode_bytes compiles for the first long chunk is used for every chunk after it
+    """
+    enigma_machine = encoding_worker_settings["enigma_machine"]
+    enigma_machine.seek(key_presses)
+
+    return enigma_machine.encode_bytes(chunk.encode("ascii")).decode("ascii")
@@ -0,0 +1,133 @@
+from enigma import *
+import argparse
+import mmap
+import os
+import sys
+import time
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description="Encrypts or decrypts a file with an enigma machine. Letters in "
+        "either case are encoded and every other byte is copied over as it is"
+    )
+    parser.add_argument("input", help="the file to encode")
+    parser.add_argument("output", help="the file to write the encoded bytes to")
+    parser.add_argument(
+        "--rotors",
+        nargs="+",
+        required=True,
+        help="the rotor names from left to right, e.g. I II III",
+    )
+    parser.add_argument(
+        "--rings",
+        nargs="+",
+        required=True,
+        help="the ring settings from left to right, e.g. 1 1 1",
+    )
+    parser.add_argument(
+        "--positions",
+        nargs="+",
+        required=True,
+        help="the position settings from left to right, e.g. A A Z",
+    )
+    reflector = parser.add_mutually_exclusive_group(required=True)
+    reflector.add_argument("--reflector", help="the name of the reflector, e.g. B")
+    reflector.add_argument(
+        "--custom-reflector",
+        help="the mapping of a custom reflector, e.g. YRUHQSLDPXNGOKMIEBFZCWVJAT",
+    )
+    parser.add_argument(
+        "--leads", nargs="*", default=[], help="the plugboard leads, e.g. AB CD"
+    )
+
+    return parser
+
+
+def encode_file(enigma_machine, input_path, output_path):
+    """
+    Encodes the input file into the output file, returning the number of bytes
+    encoded
+
+    Both files are memory mapped, and the output file is made the same size as the
+    input file before anything is encoded, so the encoded bytes are written straight
+    into it by EnigmaMachine.encode_bytes without ever holding either file in memory
+
+    The output file is truncated before the input is read, so the input and output
+    can't be the same file
+    """
+    if os.path.exists(output_path) and os.path.samefile(input_path, output_path):
+        raise EnigmaCliError("The input and output must be different files")
+
+    with open(input_path, "rb") as input_file, open(output_path, "w+b") as output_file:
+        size = os.fstat(input_file.fileno()).st_size
+        output_file.truncate(size)
+
+        # an empty file can't be memory mapped
+        if size == 0:
+            return 0
+
+        with mmap.mmap(
+            input_file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data, mmap.mmap(
+            output_file.fileno(), size, access=mmap.ACCESS_WRITE
+        ) as output:
+            enigma_machine.encode_bytes(data, output)
+            output.flush()
+
+    return size
+
+
+def main(argv=None):
+    arguments = get_parser().parse_args(argv)
+
+    try:
+        if arguments.custom_reflector is not None and not is_valid_reflector_mapping(
+            arguments.custom_reflector
+        ):
+            raise EnigmaCliError(
+                "The custom reflector must be 26 uppercase letters that pair every "
+                "letter with a different letter"
+            )
+
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            arguments.rotors,
+            arguments.rings,
+            arguments.positions,
+            reflector_name=arguments.reflector,
+            custom_reflector_mapping=arguments.custom_reflector
+            and {
+                "mapping": arguments.custom_reflector,
+                "original_reflector_name": "Custom",
+            },
+            lead_settings=arguments.leads,
+        )
+
+        start_time = time.perf_counter()
+        size = encode_file(enigma_machine, arguments.input, arguments.output)
+        elapsed_time = time.perf_counter() - start_time
+    except (
+        EnigmaCliError,
+        EnigmaMachineFactoryError,
+        EnigmaMachineError,
+        RotorCradleError,
+        RotorError,
+        ReflectorError,
+        PlugboardError,
+        PlugLeadError,
+        OSError,
+    ) as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 1
+
+    megabytes_per_second = size / elapsed_time / 1e6 if elapsed_time else 0
+    print(
+        f"Encoded {size} bytes in {elapsed_time:.3f}s ({megabytes_per_second:.2f} MB/s)",
+        file=sys.stderr,
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,16 @@
 from errors import *
+import functools
+import types
 
+UPPERCASE_LETTERS = bytes(range(65, 91))
 
+
+@functools.cache
 def get_standard_reflector_mapping(reflector_name):
+    """
+    The mappings are cached, so every reflector with the same name shares the same
+    (immutable) mapping rather than having its own copy
+    """
     match reflector_name:
         case "A":
             return tuple("EJMZALYXVBWFCRQUONTSPIKHGD")
@@ -15,40 +24,45 @@ def get_standard_reflector_mapping(reflector_name):
             )
 
 
+@functools.cache
 def get_rotor_mappings(reflector_name):
+    """
+    As with get_standard_reflector_mapping, the mappings are cached and shared by
+    every rotor with the same name, so they are given back as read only dicts
+    """
     match reflector_name:
         case "Beta":
-            return {
+            rotor_mappings = {
                 "mapping": tuple("LEYJVCNIXWPBQMDRTAKZGFUHOS"),
                 "notch": -1,
             }
         case "Gamma":
-            return {
+            rotor_mappings = {
                 "mapping": tuple("FSOKANUERHMBTIYCWLQPZXVGJD"),
                 "notch": -1,
             }
         case "I":
-            return {
+            rotor_mappings = {
                 "mapping": tuple("EKMFLGDQVZNTOWYHXUSPAIBRCJ"),
                 "notch": 16,
             }
         case "II":
-            return {
+            rotor_mappings = {
                 "mapping": tuple("AJDKSIRUXBLHWTMCQGZNPYFVOE"),
                 "notch": 4,
             }
         case "III":
-            return {
+            rotor_mappings = {
                 "mapping": tuple("BDFHJLCPRTXVZNYEIWGAKMUSQO"),
                 "notch": 21,
             }
         case "IV":
-            return {
+            rotor_mappings = {
                 "mapping": tuple("ESOVPZJAYQUIRHXLNFTGKDCMWB"),
                 "notch": 9,
             }
         case "V":
-            return {
+            rotor_mappings = {
                 "mapping": tuple("VZBRGITYUPSDNHLXAWMJQOFECK"),
                 "notch": 25,
             }
@@ -57,6 +71,45 @@ def get_rotor_mappings(reflector_name):
                 "You tried to get the mapping of a rotor that does not exist"
             )
 
+    return types.MappingProxyType(rotor_mappings)
+
+
+@functools.cache
+def get_rotor_offset_tables(mapping):
+    """
+    Builds integer lookup tables for a rotor mapping, one for every possible offset
+
+    The offset of a rotor (the difference between its position and ring setting) is
+    the only thing that changes the route a signal takes through its internal wiring,
+    so a rotor can only ever be in one of 26 wiring states. For each of these we store
+    where a signal entering on each pin (right to left) or contact (left to right)
+    exits the rotor, which means encoding a signal becomes a single indexed lookup:
+
+    right_to_left_tables[offset][pin] -> exit contact
+    left_to_right_tables[offset][contact] -> exit pin
+
+    The tables only depend on the mapping, so they are cached and shared by every
+    rotor with the same internal wiring
+    """
+    wiring = [ord(char) - 65 for char in mapping]
+    inverse_wiring = [0] * 26
+    for pin, contact in enumerate(wiring):
+        inverse_wiring[contact] = pin
+
+    right_to_left_tables = tuple(
+        tuple((wiring[(pin + offset) % 26] - offset) % 26 for pin in range(26))
+        for offset in range(26)
+    )
+    left_to_right_tables = tuple(
+        tuple(
+            (inverse_wiring[(contact + offset) % 26] - offset) % 26
+            for contact in range(26)
+        )
+        for offset in range(26)
+    )
+
+    return right_to_left_tables, left_to_right_tables
+
 
 def is_valid_enigma_input_string(string):
     """
@@ -69,3 +122,41 @@ def is_valid_enigma_input_string(string):
         return False
 
     return string.isalpha() and string.isupper()
+
+
+def is_valid_reflector_mapping(mapping):
+    """
+    A reflector wires the 26 letters together in 13 pairs, so a valid mapping is 26
+    uppercase letters where every letter is mapped to a different letter that is
+    mapped back to it
+
+    This is also what makes sure an enigma machine never encodes a letter to itself,
+    which the code cracker relies on to rule out crib positions (see
+    get_possible_crib_positions)
+    """
+    if isinstance(mapping, str):
+        letters = mapping
+    else:
+        # with no empty strings, 26 of them can only join into 26 letters if each
+        # of them is a single letter
+        if len(mapping) != 26 or "" in mapping:
+            return False
+
+        try:
+            letters = "".join(mapping)
+        except TypeError:
+            return False
+
+    if len(letters) != 26 or not (
+        letters.isascii() and letters.isalpha() and letters.isupper()
+    ):
+        return False
+
+    # every letter has to be reflected back to where it came from, so reflecting
+    # the reflected letters gives back the alphabet
+    pins = letters.encode("ascii")
+    reflected_pins = pins.translate(bytes.maketrans(UPPERCASE_LETTERS, pins))
+
+    return reflected_pins == UPPERCASE_LETTERS and all(
+        map(int.__ne__, pins, UPPERCASE_LETTERS)
+    )
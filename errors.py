@@ -28,3 +28,39 @@ class EnigmaMachineError(Exception):
 
 class EnigmaCodeCrackerError(Exception):
     pass
+
+
+class KeystreamCacheError(Exception):
+    pass
+
+
+class BatchedEnigmaEngineError(Exception):
+    pass
+
+
+class KeyspaceError(Exception):
+    pass
+
+
+class BombeError(Exception):
+    pass
+
+
+class CiphertextOnlyCrackerError(Exception):
+    pass
+
+
+class NgramTableError(Exception):
+    pass
+
+
+class PlugboardHillClimberError(Exception):
+    pass
+
+
+class MachineConfigError(Exception):
+    pass
+
+
+class EnigmaCliError(Exception):
+    pass
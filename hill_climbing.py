@@ -0,0 +1,250 @@
+from enigma import *
+import itertools as it
+import math
+import random
+
+# the most leads that a plugboard can hold
+MAXIMUM_NUMBER_OF_LEADS = 10
+
+
+class NgramTable:
+    """
+    Holds the log probability of every n-gram (i.e every pair of letters when n is
+    2, or every three letters when n is 3) in a sample of text
+
+    The sample is whatever text the caller has that looks like the messages being
+    cracked, and only its letters are used. The n-grams are stored in a flat list
+    indexed like the digits of a number (the last letter changing fastest), so an
+    n-gram of pins can be scored without building any strings. Any n-gram that isn't
+    in the sample is given a probability a little lower than one that was seen once
+    """
+
+    def __init__(self, sample_text, n=3):
+        if n < 1:
+            raise NgramTableError("n must be at least 1")
+
+        pins = [ord(char) - 65 for char in sample_text.upper() if char.isalpha()]
+        pins = [pin for pin in pins if 0 <= pin < 26]
+
+        if len(pins) < n:
+            raise NgramTableError("The sample text must have at least n letters in it")
+
+        self.n = n
+        counts = [0] * 26**n
+
+        for i in range(len(pins) - n + 1):
+            counts[self.get_index(pins[i : i + n])] += 1
+
+        total = sum(counts)
+        unseen_log_probability = math.log10(0.1 / total)
+        self.log_probabilities = [
+            math.log10(count / total) if count else unseen_log_probability
+            for count in counts
+        ]
+
+    def get_index(self, pins):
+        index = 0
+        for pin in pins:
+            index = index * 26 + pin
+
+        return index
+
+    def score(self, pins):
+        """
+        The log probability of a string of pins, found by adding up the log
+        probability of every n-gram in it
+        """
+        n = self.n
+        log_probabilities = self.log_probabilities
+        index = 0
+        total = 0
+        # the index of the n-gram ending at each pin is worked out from the index of
+        # the n-gram before it, by dropping its first letter and adding the new one
+        modulus = 26 ** (n - 1)
+
+        for i, pin in enumerate(pins):
+            index = (index % modulus) * 26 + pin
+            if i >= n - 1:
+                total += log_probabilities[index]
+
+        return total
+
+
+class PlugboardHillClimber:
+    """
+    Works out the plugboard for a code once the rotor settings are known, by making
+    small changes to it one at a time and keeping any change that makes the decoded
+    string look more like the sample text the NgramTable was built from
+
+    The changes are adding a lead between two letters without one, removing a lead,
+    or moving one end of a lead to a letter without one. Once none of these improve
+    the score, the climb is finished. Since a climb can get stuck on a plugboard that
+    is only partly right, it can be restarted (restarts times) from a plugboard with
+    random leads, and the best plugboard from every climb is kept
+
+    The substitutions the rotor cradle applies are worked out once (see
+    RotorCradle.get_keystream), since they don't depend on the plugboard, so each
+    plugboard is tried with just a few lookups per character. Leads that are already
+    known (known_lead_settings) are never moved or removed
+    """
+
+    def __init__(
+        self,
+        code,
+        rotor_names,
+        ring_settings,
+        position_settings,
+        reflector,
+        ngram_table,
+        known_lead_settings=[],
+        restarts=0,
+        seed=None,
+    ):
+        if not is_valid_enigma_input_string(code):
+            raise PlugboardHillClimberError(
+                "The code must be uppercase letters of the alphabet only with no spaces"
+            )
+
+        if restarts < 0:
+            raise PlugboardHillClimberError("The number of restarts can't be negative")
+
+        # the leads are checked and put into uppercase the same way the plugboard
+        # does it, so they can be turned into pins
+        known_lead_settings = [
+            PlugLead(lead_setting).characters for lead_setting in known_lead_settings
+        ]
+
+        self.code = code
+        self.ngram_table = ngram_table
+        self.random = random.Random(seed)
+        self.code_pins = [ord(char) - 65 for char in code]
+
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            rotor_names,
+            ring_settings,
+            position_settings,
+            reflector_name=reflector.get("name"),
+            custom_reflector_mapping=reflector.get("custom_reflector_mapping"),
+            lead_settings=known_lead_settings,
+        )
+        self.keystream = enigma_machine.rotor_cradle.get_keystream(len(code))
+
+        self.known_pins = set(
+            ord(char) - 65
+            for lead_setting in known_lead_settings
+            for char in lead_setting
+        )
+        known_steckers = list(range(26))
+        for lead_setting in known_lead_settings:
+            first_pin, second_pin = (ord(char) - 65 for char in lead_setting)
+            known_steckers[first_pin] = second_pin
+            known_steckers[second_pin] = first_pin
+
+        self.steckers, self.score = self.__climb__(known_steckers)
+        for _ in range(restarts):
+            steckers, score = self.__climb__(self.__add_random_leads__(known_steckers))
+            if score > self.score:
+                self.steckers, self.score = steckers, score
+
+        self.lead_settings = [
+            chr(pin + 65) + chr(partner + 65)
+            for pin, partner in enumerate(self.steckers)
+            if pin < partner
+        ]
+        self.decoded_string = "".join(
+            chr(pin + 65) for pin in self.__decode__(self.steckers)
+        )
+
+    def __decode__(self, steckers):
+        return [
+            steckers[permutation[steckers[pin]]]
+            for pin, permutation in zip(self.code_pins, self.keystream)
+        ]
+
+    def __score__(self, steckers):
+        return self.ngram_table.score(self.__decode__(steckers))
+
+    def __climb__(self, steckers):
+        score = self.__score__(steckers)
+        improved = True
+
+        while improved:
+            improved = False
+
+            for new_steckers in self.__get_neighbours__(steckers):
+                new_score = self.__score__(new_steckers)
+                if new_score > score:
+                    steckers, score = new_steckers, new_score
+                    improved = True
+                    break
+
+        return steckers, score
+
+    def __get_neighbours__(self, steckers):
+        """
+        Lazily gets every plugboard that is one change away from steckers, in a
+        random order so that restarts don't all climb the same way
+        """
+        free_pins = [
+            pin
+            for pin in range(26)
+            if steckers[pin] == pin and pin not in self.known_pins
+        ]
+        leads = [
+            (pin, partner)
+            for pin, partner in enumerate(steckers)
+            if pin < partner and pin not in self.known_pins
+        ]
+        number_of_leads = sum(
+            1 for pin, partner in enumerate(steckers) if pin < partner
+        )
+
+        changes = []
+        if number_of_leads < MAXIMUM_NUMBER_OF_LEADS:
+            changes += [((), pins) for pins in it.combinations(free_pins, 2)]
+        for lead in leads:
+            changes.append(((lead,), ()))
+            for pin in lead:
+                changes += [((lead,), (pin, free_pin)) for free_pin in free_pins]
+
+        self.random.shuffle(changes)
+
+        for leads_to_remove, lead_to_add in changes:
+            new_steckers = list(steckers)
+            for pin, partner in leads_to_remove:
+                new_steckers[pin] = pin
+                new_steckers[partner] = partner
+            if lead_to_add:
+                pin, partner = lead_to_add
+                new_steckers[pin] = partner
+                new_steckers[partner] = pin
+
+            yield new_steckers
+
+    def __add_random_leads__(self, steckers):
+        steckers = list(steckers)
+        free_pins = [
+            pin
+            for pin in range(26)
+            if steckers[pin] == pin and pin not in self.known_pins
+        ]
+        self.random.shuffle(free_pins)
+        number_of_leads = sum(
+            1 for pin, partner in enumerate(steckers) if pin < partner
+        )
+        number_of_random_leads = self.random.randint(
+            0, min(MAXIMUM_NUMBER_OF_LEADS - number_of_leads, len(free_pins) // 2)
+        )
+
+        for i in range(number_of_random_leads):
+            pin, partner = free_pins[2 * i], free_pins[2 * i + 1]
+            steckers[pin] = partner
+            steckers[partner] = pin
+
+        return steckers
+
+    def __str__(self):
+        return f"{self.lead_settings} {self.score}"
+
+    def __repr__(self):
+        return f"{self.lead_settings} {self.score}"
@@ -0,0 +1,147 @@
+from errors import *
+import hashlib
+
+# the name of each dimension of a keyspace, in the order the settings are held in
+KEYSPACE_DIMENSIONS = (
+    "reflectors",
+    "ring_settings",
+    "rotor_names",
+    "position_settings",
+    "lead_settings",
+)
+
+
+class Keyspace:
+    """
+    Represents every combination of settings that EnigmaCodeCracker checks
+
+    The combinations are ordered in the same way as they are checked, with the
+    reflectors changing slowest and the lead settings changing fastest:
+
+    (reflector, ring_setting, rotor_name, position_setting, lead_setting)
+
+    Each combination has a rank (its index in that order), which is worked out
+    from the index of each setting like the digits of a number, so a combination
+    can be found from its rank (and the size of the keyspace can be found) without
+    going through every combination before it. Slicing a Keyspace gives another
+    Keyspace covering a range of ranks, which makes it easy to split the work of
+    cracking a code up into chunks that are described by just a start and stop rank
+
+    Every setting of each dimension is read into a tuple when the keyspace is made
+    (only the combinations of them are never held in memory), so an iterator of
+    settings (e.g from get_potential_lead_settings) is used up by the first keyspace
+    it is given to. A dimension with no settings in it would make a keyspace with
+    nothing to check, so it raises a KeyspaceError instead
+    """
+
+    def __init__(
+        self,
+        rotor_names=[],
+        ring_settings=[],
+        position_settings=[],
+        reflectors=[],
+        lead_settings=[],
+    ):
+        self.settings = tuple(
+            tuple(settings)
+            for settings in (
+                reflectors,
+                ring_settings,
+                rotor_names,
+                position_settings,
+                lead_settings,
+            )
+        )
+        self.size = 1
+        for dimension, settings in zip(KEYSPACE_DIMENSIONS, self.settings):
+            if len(settings) == 0:
+                raise KeyspaceError(
+                    f"There are no {dimension.replace('_', ' ')} in the keyspace (an "
+                    "iterator of settings can only be used once)"
+                )
+
+            self.size *= len(settings)
+
+        self.start = 0
+        self.stop = self.size
+
+    def get_fingerprint(self):
+        """
+        Gets a hash of every setting in every dimension of the full keyspace, so two
+        keyspaces of the same size can be told apart (e.g when resuming from a
+        checkpoint) without keeping all of their settings around
+        """
+        return hashlib.sha256(repr(self.settings).encode()).hexdigest()
+
+    def get_settings(self, rank):
+        """
+        Gets the combination of settings with the given rank in the full keyspace
+        """
+        if rank < 0 or rank >= self.size:
+            raise IndexError("The rank is outside of the keyspace")
+
+        indexes = []
+        for settings in reversed(self.settings):
+            rank, index = divmod(rank, len(settings))
+            indexes.append(index)
+
+        return tuple(
+            settings[index] for settings, index in zip(self.settings, reversed(indexes))
+        )
+
+    def get_range(self, start, stop):
+        """
+        Gets a Keyspace covering the ranks from start up to (but not including) stop
+        in the full keyspace
+        """
+        if start < 0 or stop > self.size or start > stop:
+            raise IndexError("The range is outside of the keyspace")
+
+        keyspace_range = object.__new__(Keyspace)
+        keyspace_range.settings = self.settings
+        keyspace_range.size = self.size
+        keyspace_range.start = start
+        keyspace_range.stop = stop
+
+        return keyspace_range
+
+    def get_ranges(self, chunk_size):
+        """
+        Splits the keyspace into (start, stop) ranges of ranks with (at most)
+        chunk_size combinations in each
+        """
+        if chunk_size < 1:
+            raise KeyspaceError("The chunk size must be at least 1")
+
+        for start in range(self.start, self.stop, chunk_size):
+            yield start, min(start + chunk_size, self.stop)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            if item.step not in (None, 1):
+                raise KeyspaceError("A keyspace can only be sliced into a range")
+
+            start, stop, _ = item.indices(len(self))
+
+            return self.get_range(self.start + start, self.start + max(start, stop))
+
+        if item < 0:
+            item += len(self)
+
+        if item < 0 or item >= len(self):
+            raise IndexError("The rank is outside of the keyspace")
+
+        return self.get_settings(self.start + item)
+
+    def __iter__(self):
+        for rank in range(self.start, self.stop):
+            yield self.get_settings(rank)
+
+    def __str__(self):
+        return f"Keyspace({self.start}, {self.stop}) of {self.size}"
+
+    def __repr__(self):
+        return f"Keyspace({self.start}, {self.stop}) of {self.size}"
@@ -0,0 +1,450 @@
+from collections import OrderedDict
+from errors import *
+import functools
+
+# the rotor cradle only ever steps the three right most rotors, a fourth rotor
+# (if there is one) stays in the same position for the whole message
+NUMBER_OF_STEPPING_ROTORS = 3
+
+
+def get_keystream_key(rotor_cradle):
+    """
+    Gets the key that identifies every substitution a rotor cradle can apply
+
+    The substitutions depend on which rotors are in the cradle, their ring
+    settings, the position of any rotor that never steps and the reflector
+    wiring, but not on the positions of the stepping rotors, which is what a
+    KeystreamTable is indexed by
+    """
+    rotors = rotor_cradle.rotors
+
+    return (
+        tuple(rotor.name for rotor in rotors),
+        tuple(rotor.ring_setting for rotor in rotors),
+        tuple(rotor.position for rotor in rotors[NUMBER_OF_STEPPING_ROTORS:]),
+        tuple(rotor_cradle.reflector.mapping),
+    )
+
+
+def get_wheel_settings(rotor_cradle):
+    """
+    Gets everything about the rotors that decides the route a signal takes through
+    them from their current positions onwards (but not the reflector), so rotor
+    cradles with the same wheel settings can share a Keystream
+    """
+    rotors = rotor_cradle.rotors
+
+    return (
+        tuple(rotor.name for rotor in rotors),
+        tuple(rotor.ring_setting for rotor in rotors),
+        tuple(rotor.position for rotor in rotors),
+    )
+
+
+def get_state_index(rotor_positions):
+    """
+    Converts the positions of the stepping rotors into an index into a
+    KeystreamTable, where the right most rotor changes fastest
+    """
+    state_index = 0
+    for rotor_position in reversed(rotor_positions[:NUMBER_OF_STEPPING_ROTORS]):
+        state_index = state_index * 26 + rotor_position
+
+    return state_index
+
+
+@functools.cache
+def get_next_states(notches):
+    """
+    Works out which state every state of the stepping rotors (with these notches)
+    steps into, following the same rules as RotorCradle.step_rotors: the right most
+    rotor always steps, the middle rotor steps when the right most rotor is on its
+    notch or when it is on its own notch (the double step), and the left most rotor
+    steps when the middle rotor is on its notch
+
+    This only depends on the notches, so it is cached and shared by every
+    KeystreamTable with rotors that have the same notches
+    """
+    number_of_states = 26 ** len(notches)
+    next_states = []
+
+    for state_index in range(number_of_states):
+        positions = [(state_index // 26**i) % 26 for i in range(len(notches))]
+        on_notch = [position == notch for position, notch in zip(positions, notches)]
+        steps = [True]
+        if len(positions) > 1:
+            steps.append(on_notch[0] or on_notch[1])
+        if len(positions) > 2:
+            steps.append(on_notch[1])
+
+        next_positions = [
+            (position + 1) % 26 if step else position
+            for position, step in zip(positions, steps)
+        ]
+        next_states.append(get_state_index(next_positions))
+
+    return tuple(next_states)
+
+
+class KeystreamTable:
+    """
+    Holds the compiled substitution for every state of a rotor cradle
+
+    A rotor cradle with three stepping rotors can only ever be in 26^3 states, so
+    every substitution it can apply fits in 26^3 * 26 bytes (about 450 KB). The
+    substitutions are stored back to back in one bytes object, so the substitution
+    for a state is found at permutations[state_index * 26:(state_index + 1) * 26]
+
+    next_states holds the state that each state steps into, so the full stepping
+    order from any start position can be followed without touching the rotors
+    """
+
+    def __init__(self, rotor_cradle):
+        self.key = get_keystream_key(rotor_cradle)
+        stepping_rotors = rotor_cradle.rotors[:NUMBER_OF_STEPPING_ROTORS]
+        self.number_of_states = 26 ** len(stepping_rotors)
+        self.permutations = self.__compile_permutations__(rotor_cradle)
+        self.next_states = get_next_states(
+            tuple(rotor.notch for rotor in stepping_rotors)
+        )
+
+    def __compile_permutations__(self, rotor_cradle):
+        """
+        Compiles the substitution for every state of the stepping rotors
+
+        Rather than sending every pin through every rotor for each state, we fold
+        the reflector and any rotors that don't step into a single table first,
+        and then wrap that table in one rotor at a time from left to right, so the
+        work for the left most rotors is shared by every state of the rotors to
+        their right
+        """
+        rotors = rotor_cradle.rotors
+        stepping_rotors = rotors[:NUMBER_OF_STEPPING_ROTORS]
+        reflector = rotor_cradle.reflector
+
+        reflected_table = tuple(reflector.encode(pin) for pin in range(26))
+        for rotor in reversed(rotors[NUMBER_OF_STEPPING_ROTORS:]):
+            reflected_table = self.__wrap__(reflected_table, rotor, rotor.position)
+
+        tables_for_rotors_to_the_left = [reflected_table]
+        for rotor in reversed(stepping_rotors):
+            tables_for_rotors_to_the_left = [
+                self.__wrap__(table, rotor, position)
+                for table in tables_for_rotors_to_the_left
+                for position in range(26)
+            ]
+
+        # the list comprehension above makes the position of the rotor that was
+        # wrapped last (the right most rotor) change fastest, so the tables come
+        # out in the same order as get_state_index
+        return b"".join(bytes(table) for table in tables_for_rotors_to_the_left)
+
+    def __wrap__(self, table, rotor, position):
+        offset = (position - rotor.ring_setting) % 26
+        right_to_left = rotor.right_to_left_tables[offset]
+        left_to_right = rotor.left_to_right_tables[offset]
+
+        return tuple(left_to_right[table[right_to_left[pin]]] for pin in range(26))
+
+    def get_permutation(self, rotor_positions):
+        state_index = get_state_index(rotor_positions)
+
+        return self.permutations[state_index * 26 : (state_index + 1) * 26]
+
+    def get_size(self):
+        """
+        The approximate number of bytes the table holds on to
+        """
+        return len(self.permutations) + 8 * len(self.next_states)
+
+
+class KeystreamCache:
+    """
+    Keeps KeystreamTables for the rotor cradles that have been used most recently
+
+    Enigma machines that only differ by their start positions or plugboard share
+    the same KeystreamTable, so when the same rotors, ring settings and reflector
+    are used over and over again (i.e when cracking codes), the substitutions are
+    only ever compiled once. Once the tables use more than memory_budget bytes,
+    the least recently used tables are thrown away
+    """
+
+    def __init__(self, memory_budget=64 * 1024 * 1024):
+        if memory_budget <= 0:
+            raise KeystreamCacheError("The memory budget must be a positive number")
+
+        self.memory_budget = memory_budget
+        self.memory_used = 0
+        self.keystream_tables = OrderedDict()
+
+    def get_keystream_table(self, rotor_cradle):
+        key = get_keystream_key(rotor_cradle)
+        keystream_table = self.keystream_tables.get(key)
+
+        if keystream_table is not None:
+            self.keystream_tables.move_to_end(key)
+            return keystream_table
+
+        keystream_table = KeystreamTable(rotor_cradle)
+        self.keystream_tables[key] = keystream_table
+        self.memory_used += keystream_table.get_size()
+
+        # we always keep the table we have just compiled, even if it is bigger than
+        # the memory budget on its own, since the rotor cradle is about to use it
+        while self.memory_used > self.memory_budget and len(self.keystream_tables) > 1:
+            _, evicted_keystream_table = self.keystream_tables.popitem(last=False)
+            self.memory_used -= evicted_keystream_table.get_size()
+
+        return keystream_table
+
+    def __len__(self):
+        return len(self.keystream_tables)
+
+
+class Keystream:
+    """
+    Holds the route a signal takes through the rotors after each key press, starting
+    from the position the rotor cradle is in when the Keystream is created
+
+    The route is split into two halves: right_to_left takes a pin on the right of
+    the rotor cradle through every rotor to the reflector, and left_to_right brings
+    the reflected signal back (it's the inverse of right_to_left). Neither half
+    depends on the plugboard or the reflector, so enigma machines with the same
+    wheel settings (see get_wheel_settings) can share them, and encoding a pin is
+    just left_to_right[reflector[right_to_left[pin]]]
+
+    The halves are compiled one key press at a time and only when they are asked
+    for, so enigma machines can share them without compiling halves for key presses
+    nobody needs (i.e once every enigma machine has been ruled out by a crib). The
+    Keystream steps its own copy of the rotor cradle, so the enigma machine it came
+    from can carry on being used (or re-keyed) in the meantime
+    """
+
+    def __init__(self, rotor_cradle):
+        self.rotor_cradle = rotor_cradle.copy()
+        self.reflector_pins = rotor_cradle.reflector.get_pins()
+        self.halves = []
+        self.permutations = []
+
+    def get_halves(self, key_press):
+        """
+        Gets the (right_to_left, left_to_right) halves after key_press + 1 key presses
+        """
+        while len(self.halves) <= key_press:
+            self.rotor_cradle.step_rotors()
+            right_to_left = list(range(26))
+
+            for rotor in self.rotor_cradle.rotors:
+                offset = (rotor.position - rotor.ring_setting) % 26
+                rotor_right_to_left = rotor.right_to_left_tables[offset]
+                right_to_left = [rotor_right_to_left[pin] for pin in right_to_left]
+
+            left_to_right = [0] * 26
+            for pin, contact in enumerate(right_to_left):
+                left_to_right[contact] = pin
+
+            self.halves.append((right_to_left, left_to_right))
+
+        return self.halves[key_press]
+
+    def get_permutation(self, key_press):
+        """
+        Gets the substitution applied after key_press + 1 key presses with the
+        reflector of the rotor cradle the Keystream was created from
+        """
+        while len(self.permutations) <= key_press:
+            right_to_left, left_to_right = self.get_halves(len(self.permutations))
+            reflector_pins = self.reflector_pins
+            self.permutations.append(
+                [left_to_right[reflector_pins[contact]] for contact in right_to_left]
+            )
+
+        return self.permutations[key_press]
+
+
+class SharedKeystreams:
+    """
+    Hands out a Keystream to enigma machines that have the same wheel settings as an
+    enigma machine that came before them, whatever their plugboard or reflector
+
+    The first enigma machine with a set of wheel settings is given None (it decodes
+    with its own rotor cradle, so nothing is compiled for wheel settings that are
+    only used once), and the rotor cradle of the next one is turned into a Keystream
+    for it and every enigma machine after it. Only the keystreams for the
+    maximum_number_of_wheel_settings most recently used wheel settings are kept
+    """
+
+    def __init__(self, maximum_number_of_wheel_settings=256):
+        if maximum_number_of_wheel_settings < 1:
+            raise KeystreamCacheError(
+                "The maximum number of wheel settings must be at least 1"
+            )
+
+        self.maximum_number_of_wheel_settings = maximum_number_of_wheel_settings
+        self.keystreams = OrderedDict()
+
+    def get_keystream(self, rotor_cradle):
+        """
+        Gets the Keystream for the wheel settings of a rotor cradle that hasn't been
+        stepped yet, or None if these wheel settings haven't been seen before
+        """
+        wheel_settings = get_wheel_settings(rotor_cradle)
+
+        if wheel_settings not in self.keystreams:
+            self.keystreams[wheel_settings] = None
+            if len(self.keystreams) > self.maximum_number_of_wheel_settings:
+                self.keystreams.popitem(last=False)
+
+            return None
+
+        self.keystreams.move_to_end(wheel_settings)
+        keystream = self.keystreams[wheel_settings]
+
+        if keystream is None:
+            keystream = Keystream(rotor_cradle)
+            self.keystreams[wheel_settings] = keystream
+
+        return keystream
+
+    def __len__(self):
+        return len(self.keystreams)
+
+
+class PositionSweep:
+    """
+    Holds the substitutions a rotor cradle applies from every start position at
+    once, for a KeystreamTable (i.e for one set of rotors, ring settings and
+    reflector)
+
+    Stepping the rotors always moves them from one state to the same next state, so
+    if the rotors start one step further along, the substitutions they apply are the
+    same ones shifted along by a key press. Following next_states from any state
+    eventually goes round a cycle (with the usual stepping, one cycle of 16,900 of
+    the 17,576 states), so the substitutions for every state in a cycle are laid out
+    in the order they are stepped through, once, with the first window_length of
+    them repeated on the end so a window never has to wrap around
+
+    The substitutions for window_length key presses from a start position are then
+    a window into that one sequence, starting at the state the rotors step into on
+    the first key press (see get_window)
+    """
+
+    def __init__(self, keystream_table, window_length):
+        self.keystream_table = keystream_table
+        self.window_length = window_length
+        # the cycle (as an index into keystreams) and position in the cycle of every
+        # state that is on a cycle
+        self.cycle_positions = {}
+        self.keystreams = []
+
+        for cycle in self.__find_cycles__(keystream_table.next_states):
+            cycle_number = len(self.keystreams)
+            for i, state_index in enumerate(cycle):
+                self.cycle_positions[state_index] = (cycle_number, i)
+
+            self.keystreams.append(self.__lay_out__(cycle))
+
+    def __find_cycles__(self, next_states):
+        """
+        Finds every cycle that following next_states can end up going round
+        """
+        cycles = []
+        # 0 is a state we haven't been to, 1 is a state on the path we are following
+        # and 2 is a state we have finished with
+        visited = [0] * len(next_states)
+
+        for start_state_index in range(len(next_states)):
+            path = []
+            state_index = start_state_index
+
+            while visited[state_index] == 0:
+                visited[state_index] = 1
+                path.append(state_index)
+                state_index = next_states[state_index]
+
+            if visited[state_index] == 1:
+                cycles.append(path[path.index(state_index) :])
+
+            for path_state_index in path:
+                visited[path_state_index] = 2
+
+        return cycles
+
+    def __lay_out__(self, state_indexes):
+        """
+        Joins the substitutions for a sequence of states together, repeating them
+        until there are enough for a window to start at any of them
+        """
+        permutations = self.keystream_table.permutations
+        states_needed = len(state_indexes) + self.window_length
+        repeats = -(-states_needed // len(state_indexes))
+
+        return b"".join(
+            permutations[state_index * 26 : (state_index + 1) * 26]
+            for state_index in (state_indexes * repeats)[:states_needed]
+        )
+
+    def get_window(self, rotor_positions):
+        """
+        Gets a keystream and an offset into it, so that the substitution applied on
+        key press i (counting from 0) from the start position rotor_positions is
+        keystream[(offset + i) * 26 : (offset + i + 1) * 26]
+        """
+        next_states = self.keystream_table.next_states
+        first_state_index = next_states[get_state_index(rotor_positions)]
+        cycle_position = self.cycle_positions.get(first_state_index)
+
+        if cycle_position is not None:
+            cycle_number, offset = cycle_position
+            return self.keystreams[cycle_number], offset
+
+        # the rotors take more than one key press to reach a cycle from here, which
+        # never happens with the usual stepping, so we lay out the states one by one
+        state_indexes = [first_state_index]
+        for _ in range(self.window_length - 1):
+            state_indexes.append(next_states[state_indexes[-1]])
+
+        return self.__lay_out__(state_indexes), 0
+
+    def get_size(self):
+        return sum(len(keystream) for keystream in self.keystreams)
+
+
+class PositionSweeps:
+    """
+    Keeps the PositionSweeps for the rotor cradles that have been used most recently,
+    along with the KeystreamTables they are laid out from, within memory_budget bytes
+    """
+
+    def __init__(self, window_length, memory_budget=64 * 1024 * 1024):
+        self.window_length = window_length
+        self.keystream_cache = KeystreamCache(memory_budget)
+        self.position_sweeps = OrderedDict()
+        self.memory_used = 0
+
+    def get_window(self, rotor_cradle):
+        """
+        Gets the window (see PositionSweep.get_window) for the position the rotor
+        cradle is in
+        """
+        key = get_keystream_key(rotor_cradle)
+        position_sweep = self.position_sweeps.get(key)
+
+        if position_sweep is None:
+            position_sweep = PositionSweep(
+                self.keystream_cache.get_keystream_table(rotor_cradle),
+                self.window_length,
+            )
+            self.position_sweeps[key] = position_sweep
+            self.memory_used += position_sweep.get_size()
+
+            while (
+                self.memory_used > self.keystream_cache.memory_budget
+                and len(self.position_sweeps) > 1
+            ):
+                _, evicted_position_sweep = self.position_sweeps.popitem(last=False)
+                self.memory_used -= evicted_position_sweep.get_size()
+        else:
+            self.position_sweeps.move_to_end(key)
+
+        return position_sweep.get_window(rotor_cradle.get_rotor_positions())
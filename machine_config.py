@@ -0,0 +1,204 @@
+from enigma import *
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class MachineConfig:
+    """
+    Holds the settings of an enigma machine that never change while a message is
+    encoded: the rotors, their ring settings and start positions, the reflector and
+    the plugboard
+
+    The settings are given in the same order as EnigmaMachineFactory takes them (the
+    order the rotors appear in the rotor cradle in real life). Unlike an
+    EnigmaMachine, a MachineConfig is immutable and hashable, since where the rotors
+    are in a message is kept in a separate RotorState. This means one MachineConfig
+    can be used to encode (or decode) any number of messages at the same time, e.g
+    from a thread pool or in asyncio handlers, without creating an enigma machine
+    for each of them
+
+    The settings are checked by creating an enigma machine from them when the
+    MachineConfig is created, and the integer tables needed to encode with them are
+    compiled at the same time (see encode_with_config)
+    """
+
+    rotor_names: tuple
+    ring_settings: tuple
+    position_settings: tuple
+    reflector_name: str = None
+    # the 26 letters of a custom reflector, in which case reflector_name is the
+    # name of the reflector it was made from
+    custom_reflector_mapping: tuple = None
+    lead_settings: tuple = ()
+
+    # compiled from the settings above, in the order the signal goes through the
+    # rotors (right to left)
+    notches: tuple = field(init=False, repr=False, compare=False)
+    ring_offsets: tuple = field(init=False, repr=False, compare=False)
+    right_to_left_tables: tuple = field(init=False, repr=False, compare=False)
+    left_to_right_tables: tuple = field(init=False, repr=False, compare=False)
+    reflector_pins: tuple = field(init=False, repr=False, compare=False)
+    plugboard_pins: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not (
+            len(self.rotor_names)
+            == len(self.ring_settings)
+            == len(self.position_settings)
+        ):
+            raise MachineConfigError(
+                "You must give a ring setting and a position setting for every rotor"
+            )
+
+        # the settings are turned into tuples (and the ring settings into numbers)
+        # so that configs with the same settings are equal and hashable
+        settings = {
+            "rotor_names": tuple(self.rotor_names),
+            "ring_settings": tuple(
+                int(ring_setting) for ring_setting in self.ring_settings
+            ),
+            "position_settings": tuple(self.position_settings),
+            "lead_settings": tuple(self.lead_settings),
+        }
+        if self.custom_reflector_mapping is not None:
+            settings["custom_reflector_mapping"] = tuple(self.custom_reflector_mapping)
+
+        for name, value in settings.items():
+            object.__setattr__(self, name, value)
+
+        enigma_machine = self.create_enigma_machine()
+        rotors = enigma_machine.rotor_cradle.rotors
+
+        compiled_settings = {
+            "notches": tuple(rotor.notch for rotor in rotors),
+            "ring_offsets": tuple(rotor.ring_setting for rotor in rotors),
+            "right_to_left_tables": tuple(
+                rotor.right_to_left_tables for rotor in rotors
+            ),
+            "left_to_right_tables": tuple(
+                rotor.left_to_right_tables for rotor in rotors
+            ),
+            "reflector_pins": tuple(enigma_machine.rotor_cradle.reflector.get_pins()),
+            "plugboard_pins": tuple(enigma_machine.plugboard.get_pins()),
+        }
+
+        for name, value in compiled_settings.items():
+            object.__setattr__(self, name, value)
+
+    def create_enigma_machine(self):
+        """
+        Creates an EnigmaMachine with these settings, with its rotors in their start
+        positions
+        """
+        custom_reflector_mapping = None
+        if self.custom_reflector_mapping is not None:
+            custom_reflector_mapping = {
+                "mapping": self.custom_reflector_mapping,
+                "original_reflector_name": self.reflector_name,
+            }
+
+        return EnigmaMachineFactory.create_enigma_machine(
+            self.rotor_names,
+            self.ring_settings,
+            self.position_settings,
+            reflector_name=self.reflector_name,
+            custom_reflector_mapping=custom_reflector_mapping,
+            lead_settings=self.lead_settings,
+        )
+
+    def get_initial_state(self):
+        """
+        Gets the RotorState with every rotor in its start position
+        """
+        return RotorState(
+            tuple(
+                ord(position_setting) - 65
+                for position_setting in reversed(self.position_settings)
+            )
+        )
+
+
+@dataclass(frozen=True)
+class RotorState:
+    """
+    The positions of the rotors at some point in a message (0 is A and 25 is Z), in
+    the order the signal goes through them (right to left), like
+    RotorCradle.get_rotor_positions
+    """
+
+    positions: tuple
+
+
+def step_rotor_positions(notches, positions):
+    """
+    Steps a list of rotor positions in place, following the same rules as
+    RotorCradle.step_rotors
+    """
+    right_rotor_on_notch = positions[0] == notches[0]
+    middle_rotor_on_notch = positions[1] == notches[1]
+
+    positions[0] = (positions[0] + 1) % 26
+
+    if right_rotor_on_notch or middle_rotor_on_notch:
+        positions[1] = (positions[1] + 1) % 26
+
+    if middle_rotor_on_notch:
+        positions[2] = (positions[2] + 1) % 26
+
+
+def encode_with_config(config, string, state=None):
+    """
+    Encodes a string with the settings in config, starting from state (or from the
+    start positions of the rotors if no state is given), giving back the encoded
+    string along with the RotorState at the end of it, so the next part of the
+    message can be encoded from there
+
+    Nothing is changed by encoding, so any number of strings can be encoded with the
+    same config (and the same state) at once
+    """
+    if not is_valid_enigma_input_string(string):
+        raise MachineConfigError(
+            "Input must be uppercase letters of the alphabet only with no spaces"
+        )
+
+    if state is None:
+        state = config.get_initial_state()
+
+    if len(state.positions) != len(config.rotor_names):
+        raise MachineConfigError("The rotor state must have a position for every rotor")
+
+    notches = config.notches
+    plugboard_pins = config.plugboard_pins
+    reflector_pins = config.reflector_pins
+    rotor_tables = list(
+        zip(
+            config.ring_offsets,
+            config.right_to_left_tables,
+            config.left_to_right_tables,
+        )
+    )
+    positions = list(state.positions)
+    encoded_string = []
+
+    for character in string:
+        step_rotor_positions(notches, positions)
+        offsets = [
+            (position - ring_offset) % 26
+            for position, (ring_offset, _, _) in zip(positions, rotor_tables)
+        ]
+
+        pin = plugboard_pins[ord(character) - 65]
+
+        for offset, (_, right_to_left_tables, _) in zip(offsets, rotor_tables):
+            pin = right_to_left_tables[offset][pin]
+
+        pin = reflector_pins[pin]
+
+        for offset, (_, _, left_to_right_tables) in zip(
+            reversed(offsets), reversed(rotor_tables)
+        ):
+            pin = left_to_right_tables[offset][pin]
+
+        encoded_string.append(chr(plugboard_pins[pin] + 65))
+
+    return "".join(encoded_string), RotorState(tuple(positions))
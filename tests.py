@@ -1,6 +1,25 @@
 from enigma import *
 from cracking_secrets import *
+from keystream import *
+from batched_engine import *
+from keyspace import *
+from bombe import *
+from ciphertext_only import *
+from hill_climbing import *
+from machine_config import *
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import dataclasses
+import enigma_cli
+import io
+import itertools as it
+import math
+import os
+import pickle
+import random
+import tempfile
 import unittest
+import unittest.mock
 import string
 
 
@@ -38,6 +57,30 @@ class TestPlugLeads(unittest.TestCase):
 
 
 class TestPlugboard(unittest.TestCase):
+    def test_get_pins(self):
+        plugboard = Plugboard()
+        plugboard.add(PlugLead("AG"))
+        plugboard.add(PlugLead("ZB"))
+        pins = plugboard.get_pins()
+
+        for pin in range(26):
+            self.assertEqual(chr(pins[pin] + 65), plugboard.encode(chr(pin + 65)))
+
+    def test_leads(self):
+        plugboard = Plugboard()
+        plugboard.add(PlugLead("ZB"))
+        plugboard.add(PlugLead("ag"))
+
+        self.assertEqual([lead.characters for lead in plugboard.leads], ["ZB", "AG"])
+        self.assertEqual(str(plugboard), "[ZB, AG]")
+        self.assertEqual(plugboard.encode("B"), "Z")
+        self.assertEqual(plugboard.encode("C"), "C")
+
+        with self.assertRaises(PlugboardError):
+            plugboard.add(PlugLead("CG"))
+
+        self.assertEqual(plugboard.encode("C"), "C")
+
     def test_plug_lead_chars_are_not_unique(self):
         plugboard = Plugboard()
         lead = PlugLead("AG")
@@ -81,6 +124,68 @@ class TestRotorCradle(unittest.TestCase):
         with self.assertRaises(RotorCradleError):
             rotor_cradle.add_reflector(reflector_two)
 
+    def test_compiled_permutation_is_an_involution(self):
+        rotor_cradle = RotorCradle()
+        rotor_cradle.add_rotor(Rotor("III", position_setting="V", ring_setting=4))
+        rotor_cradle.add_rotor(Rotor("II", position_setting="E"))
+        rotor_cradle.add_rotor(Rotor("I", position_setting="Q", ring_setting=20))
+        rotor_cradle.add_reflector(Reflector("B"))
+
+        permutation = rotor_cradle.get_permutation()
+
+        self.assertEqual(sorted(permutation), list(range(26)))
+        for pin in range(26):
+            self.assertNotEqual(permutation[pin], pin)
+            self.assertEqual(permutation[permutation[pin]], pin)
+
+    def test_permutations_are_cached_by_rotor_positions(self):
+        rotor_cradle = RotorCradle()
+        rotor_cradle.add_rotor(Rotor("III"))
+        rotor_cradle.add_rotor(Rotor("II"))
+        rotor_cradle.add_rotor(Rotor("I"))
+        rotor_cradle.add_reflector(Reflector("B"))
+
+        rotor_positions_seen = set()
+        for _ in range(100):
+            rotor_cradle.encode("A")
+            rotor_positions_seen.add(rotor_cradle.get_rotor_positions())
+
+        self.assertEqual(
+            set(rotor_cradle.compiled_permutations.keys()), rotor_positions_seen
+        )
+        self.assertIs(rotor_cradle.get_permutation(), rotor_cradle.get_permutation())
+
+    def test_advance_matches_stepping(self):
+        for rotor_names, position_settings in [
+            (["III", "II", "I"], it.product("AUVW", "ADEF", "AQZ")),
+            (["I", "V", "Beta"], it.product("AQR", "YZ", "AQ")),
+            (["III", "II", "I", "Gamma"], it.product("AVW", "DE", "Q", "C")),
+        ]:
+            for position_setting in position_settings:
+                rotor_cradle = RotorCradle()
+                stepped_rotor_cradle = RotorCradle()
+                for rotor_name, position in zip(rotor_names, position_setting):
+                    rotor_cradle.add_rotor(Rotor(rotor_name, position))
+                    stepped_rotor_cradle.add_rotor(Rotor(rotor_name, position))
+
+                rotor_positions = [stepped_rotor_cradle.get_rotor_positions()]
+                for _ in range(700):
+                    stepped_rotor_cradle.step_rotors()
+                    rotor_positions.append(stepped_rotor_cradle.get_rotor_positions())
+
+                for number_of_key_presses in [0, 1, 2, 25, 26, 27, 51, 52, 677, 700]:
+                    for rotor in rotor_cradle.rotors:
+                        rotor.reset()
+                    rotor_cradle.advance(number_of_key_presses)
+
+                    self.assertEqual(
+                        rotor_cradle.get_rotor_positions(),
+                        rotor_positions[number_of_key_presses],
+                    )
+
+        with self.assertRaises(RotorCradleError):
+            rotor_cradle.advance(-1)
+
 
 class TestRotor(unittest.TestCase):
     def test_incorrect_mapping(self):
@@ -92,6 +197,20 @@ class TestRotor(unittest.TestCase):
         rotor_mapping_one = get_rotor_mappings("I")
         self.assertEqual(rotor.mapping, rotor_mapping_one["mapping"])
 
+    def test_rotors_share_their_wiring(self):
+        rotor = Rotor("I")
+        rotor_two = Rotor("I", position_setting="Q", ring_setting=5)
+
+        self.assertIs(rotor.mapping, rotor_two.mapping)
+        self.assertIs(rotor.right_to_left_tables, rotor_two.right_to_left_tables)
+        self.assertIs(Reflector("B").mapping, Reflector("B").mapping)
+
+        with self.assertRaises(TypeError):
+            get_rotor_mappings("I")["notch"] = 0
+
+        with self.assertRaises(AttributeError):
+            rotor.wiring = {}
+
     def test_encode_from_left_to_right(self):
         alphabet_uppercased = string.ascii_uppercase
 
@@ -184,6 +303,31 @@ class TestRotor(unittest.TestCase):
             alphabet_uppercased.index("C"),
         )
 
+    def test_encode_with_position_and_ring_setting(self):
+        alphabet_uppercased = string.ascii_uppercase
+
+        for position_setting in alphabet_uppercased:
+            for ring_setting in range(1, 27):
+                rotor = Rotor(
+                    "I", position_setting=position_setting, ring_setting=ring_setting
+                )
+                offset = rotor.position - rotor.ring_setting
+
+                for pin in range(26):
+                    label_index = alphabet_uppercased.index(
+                        rotor.mapping[(pin + offset) % 26]
+                    )
+                    exit_contact = (label_index - offset) % 26
+                    self.assertEqual(rotor.encode_from_right_to_left(pin), exit_contact)
+                    self.assertEqual(rotor.encode_from_left_to_right(exit_contact), pin)
+
+    def test_offset_tables_are_shared_between_rotors(self):
+        rotor_one = Rotor("IV", position_setting="C", ring_setting=3)
+        rotor_two = Rotor("IV", position_setting="X", ring_setting=20)
+
+        self.assertIs(rotor_one.right_to_left_tables, rotor_two.right_to_left_tables)
+        self.assertIs(rotor_one.left_to_right_tables, rotor_two.left_to_right_tables)
+
 
 class TestReflector(unittest.TestCase):
     def test_incorrect_mapping(self):
@@ -196,11 +340,10 @@ class TestReflector(unittest.TestCase):
         self.assertEqual(reflector.mapping, reflector_mapping_a)
 
     def test_custom_reflector_mapping(self):
-        alphabet_uppercase_tuple = tuple(string.ascii_uppercase)
-        reflector = CustomReflector(
-            original_reflector_name="A", mapping=alphabet_uppercase_tuple
-        )
-        self.assertEqual(reflector.mapping, alphabet_uppercase_tuple)
+        # reflector A with the wires of AE and BJ swapped to AJ and BE
+        mapping = tuple("JEMZBLYXVAWFCRQUONTSPIKHGD")
+        reflector = CustomReflector(original_reflector_name="A", mapping=mapping)
+        self.assertEqual(reflector.mapping, mapping)
 
     def test_custom_reflector_incorrect_mapping(self):
         alphabet_uppercase_tuple_double = tuple(string.ascii_uppercase * 2)
@@ -210,8 +353,378 @@ class TestReflector(unittest.TestCase):
                 original_reflector_name="B", mapping=alphabet_uppercase_tuple_double
             )
 
+        # a letter can't be wired to itself, every wire has to go both ways, and the
+        # letters have to be uppercase
+        for mapping in [
+            string.ascii_uppercase,
+            "YRUHQSLDPXNGOKMIEBFZCWVJTA",
+            "yruhqsldpxngokmiebfzcwvjat",
+        ]:
+            with self.assertRaises(ReflectorError):
+                CustomReflector(original_reflector_name="B", mapping=tuple(mapping))
+
 
 class TestEnigmaMachine(unittest.TestCase):
+    def test_encode_in_parallel(self):
+        settings = dict(
+            rotor_names=["Beta", "V", "II", "IV"],
+            ring_settings=["2", "6", "18", "7"],
+            position_settings=["C", "A", "J", "L"],
+            reflector_name="B",
+            lead_settings=["UG", "IE", "PO", "NX", "WT"],
+        )
+        message = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 2000
+
+        for chunk_size in [1000, len(message) // 2 + 1]:
+            enigma_machine = EnigmaMachineFactory.create_enigma_machine(**settings)
+            enigma_machine.encode("HELLO")
+            enigma_machine_in_parallel = EnigmaMachineFactory.create_enigma_machine(
+                **settings
+            )
+            enigma_machine_in_parallel.encode("HELLO")
+
+            self.assertEqual(
+                enigma_machine_in_parallel.encode_in_parallel(
+                    message, workers=2, chunk_size=chunk_size
+                ),
+                enigma_machine.encode(message),
+            )
+            self.assertEqual(
+                enigma_machine_in_parallel.rotor_cradle.get_rotor_positions(),
+                enigma_machine.rotor_cradle.get_rotor_positions(),
+            )
+
+        with self.assertRaises(EnigmaMachineError):
+            enigma_machine.encode_in_parallel("hello")
+
+        with self.assertRaises(EnigmaMachineError):
+            enigma_machine.encode_in_parallel(message, workers=0)
+
+        with self.assertRaises(EnigmaMachineError):
+            enigma_machine.encode_in_parallel(message, chunk_size=0)
+
+    def test_encode_chunks_in_parallel(self):
+        settings = dict(
+            rotor_names=["V", "II", "IV"],
+            ring_settings=["6", "18", "7"],
+            position_settings=["A", "J", "L"],
+            reflector_name="B",
+        )
+        message = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 100
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(**settings)
+
+        # the string is checked as soon as the chunks are asked for, not when the
+        # first one is given back
+        with self.assertRaises(EnigmaMachineError):
+            enigma_machine.encode_chunks_in_parallel("hello")
+
+        with self.assertRaises(EnigmaMachineError):
+            enigma_machine.encode_chunks_in_parallel(message, workers=0)
+
+        # stopping early leaves the rotors where encode would have left them after
+        # the chunks that were given back
+        encoded_chunks = enigma_machine.encode_chunks_in_parallel(
+            message, workers=2, chunk_size=700
+        )
+        first_encoded_chunk = next(encoded_chunks)
+        encoded_chunks.close()
+
+        expected_enigma_machine = EnigmaMachineFactory.create_enigma_machine(**settings)
+        self.assertEqual(
+            first_encoded_chunk, expected_enigma_machine.encode(message[:700])
+        )
+        self.assertEqual(
+            enigma_machine.rotor_cradle.get_rotor_positions(),
+            expected_enigma_machine.rotor_cradle.get_rotor_positions(),
+        )
+
+    def test_seek(self):
+        settings = dict(
+            rotor_names=["V", "II", "IV"],
+            ring_settings=["6", "18", "7"],
+            position_settings=["A", "J", "L"],
+            reflector_name="B",
+            lead_settings=["UG", "IE", "PO", "NX", "WT"],
+        )
+        message = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 30
+        encoded_message = EnigmaMachineFactory.create_enigma_machine(**settings).encode(
+            message
+        )
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(**settings)
+        enigma_machine.encode("ABC")
+
+        for offset in [0, 7, 400, 1000]:
+            enigma_machine.seek(offset)
+            self.assertEqual(
+                enigma_machine.encode_bytes(message[offset:].encode()),
+                encoded_message[offset:].encode(),
+            )
+
+    def test_encoding_doesnt_carry_on_between_strings(self):
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["I", "II", "III"], ["1", "1", "1"], ["A", "A", "Z"], reflector_name="B"
+        )
+
+        self.assertEqual(enigma_machine.encode("A"), "U")
+        self.assertEqual(enigma_machine.encode("A"), "U")
+
+        enigma_machine.seek(100)
+        self.assertEqual(enigma_machine.encode("A"), "U")
+
+    def test_re_keying(self):
+        settings = [
+            (["I", "II", "III"], ["1", "1", "1"], ["A", "A", "Z"], ["HL", "MO"]),
+            (["I", "II", "III"], ["1", "1", "1"], ["Q", "E", "V"], []),
+            (["I", "II", "III"], ["7", "11", "15"], ["Q", "E", "V"], ["AJ"]),
+            (["I", "II", "III"], ["7", "11", "15"], ["A", "D", "U"], ["CX", "BZ"]),
+        ]
+        message = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 30
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            *settings[0][:3], reflector_name="B"
+        )
+
+        for rotor_names, ring_settings, position_settings, lead_settings in settings:
+            enigma_machine.set_rings(ring_settings)
+            enigma_machine.set_positions(position_settings)
+            enigma_machine.set_plugboard(lead_settings)
+            copied_enigma_machine = enigma_machine.copy()
+
+            encoded_message = EnigmaMachineFactory.create_enigma_machine(
+                rotor_names,
+                ring_settings,
+                position_settings,
+                reflector_name="B",
+                lead_settings=lead_settings,
+            ).encode(message)
+
+            self.assertEqual(enigma_machine.encode(message), encoded_message)
+            self.assertEqual(str(enigma_machine), str(copied_enigma_machine))
+
+            # the copy isn't moved by encoding with (or re-keying) the enigma machine
+            enigma_machine.set_plugboard(["PK"])
+            self.assertEqual(copied_enigma_machine.encode(message), encoded_message)
+
+        enigma_machine.encode_bytes(b"HELLO")
+        enigma_machine.reset()
+        self.assertEqual(enigma_machine.rotor_cradle.get_rotor_positions(), (20, 3, 0))
+
+        with self.assertRaises(EnigmaMachineError):
+            enigma_machine.set_positions(["A", "A"])
+
+        with self.assertRaises(PlugboardError):
+            enigma_machine.set_plugboard(["AB", "BC"])
+
+    def test_encode_many(self):
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["Beta", "V", "II", "IV"],
+            ["2", "6", "18", "7"],
+            ["C", "A", "J", "L"],
+            reflector_name="B",
+            lead_settings=["UG", "IE", "PO", "NX", "WT"],
+        )
+        random_generator = random.Random(0)
+        messages = [
+            "".join(random_generator.choices(string.ascii_uppercase, k=length))
+            for length in [1, 40, 700, 3, 700, 26]
+        ]
+        encoded_messages = [enigma_machine.encode(message) for message in messages]
+
+        self.assertEqual(enigma_machine.encode_many(messages), encoded_messages)
+        self.assertEqual(enigma_machine.encode_many([]), [])
+
+        with unittest.mock.patch("enigma.np", None):
+            self.assertEqual(enigma_machine.encode_many(messages), encoded_messages)
+
+        with self.assertRaises(EnigmaMachineError):
+            enigma_machine.encode_many(["HELLO", "hello"])
+
+    def test_encoder(self):
+        settings = dict(
+            rotor_names=["V", "II", "IV"],
+            ring_settings=["6", "18", "7"],
+            position_settings=["A", "J", "L"],
+            reflector_name="B",
+            lead_settings=["UG", "IE", "PO", "NX", "WT"],
+        )
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(**settings)
+        text = "The quick brown fox, jumps over the lazy dog!\n" * 30
+        encoded_text = enigma_machine.encode_bytes(text.encode()).decode()
+
+        encoder = enigma_machine.encoder()
+        chunks = [text[start : start + 37] for start in range(0, len(text), 37)]
+        encoded_chunks = []
+        for chunk in chunks:
+            encoded_chunks.append(encoder.encode(chunk))
+            # encoding something else in between chunks doesn't change the message
+            enigma_machine.encode("HELLOWORLD")
+
+        self.assertEqual("".join(encoded_chunks), encoded_text)
+
+        encoder.reset()
+        self.assertEqual(
+            b"".join(encoder.encode_chunks(chunk.encode() for chunk in chunks)),
+            encoded_text.encode(),
+        )
+
+    def test_encoder_compiles_keystream_table_once(self):
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["I", "II", "III"], ["1", "1", "1"], ["A", "A", "Z"], reflector_name="B"
+        )
+        message = b"HELLOWORLD" * MINIMUM_LENGTH_FOR_KEYSTREAM_TABLE
+        encoded_message = enigma_machine.copy().encode_bytes(message)
+        chunk_size = MINIMUM_LENGTH_FOR_KEYSTREAM_TABLE
+
+        encoder = enigma_machine.encoder()
+        with unittest.mock.patch(
+            "enigma.KeystreamTable", wraps=KeystreamTable
+        ) as keystream_table:
+            encoded_chunks = [
+                encoder.encode(message[start : start + chunk_size])
+                for start in range(0, len(message), chunk_size)
+            ]
+
+        self.assertEqual(keystream_table.call_count, 1)
+        self.assertEqual(b"".join(encoded_chunks), encoded_message)
+
+    def test_encode_bytes(self):
+        settings = dict(
+            rotor_names=["V", "II", "IV"],
+            ring_settings=["6", "18", "7"],
+            position_settings=["A", "J", "L"],
+            reflector_name="B",
+            lead_settings=["UG", "IE", "PO", "NX", "WT"],
+        )
+        message = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 2000
+        text = b"The quick brown fox, jumps over the lazy dog!\n" * 2000
+
+        # long enough to compile a KeystreamTable, and short enough not to
+        for length in [len(message), 100]:
+            enigma_machine = EnigmaMachineFactory.create_enigma_machine(**settings)
+            enigma_machine_for_bytes = EnigmaMachineFactory.create_enigma_machine(
+                **settings
+            )
+            encoded_message = enigma_machine.encode(message[:length])
+
+            self.assertEqual(
+                enigma_machine_for_bytes.encode_bytes(message[:length].encode()),
+                encoded_message.encode(),
+            )
+            self.assertEqual(
+                enigma_machine_for_bytes.rotor_cradle.get_rotor_positions(),
+                enigma_machine.rotor_cradle.get_rotor_positions(),
+            )
+
+            # other bytes are copied over without stepping the rotors, and the case of
+            # every letter is kept
+            letters = bytes(byte for byte in text[:length] if chr(byte).isalpha())
+            encoded_letters = EnigmaMachineFactory.create_enigma_machine(
+                **settings
+            ).encode(letters.decode().upper())
+            output = bytearray(length)
+            EnigmaMachineFactory.create_enigma_machine(**settings).encode_bytes(
+                text[:length], output
+            )
+
+            letter_indexes = [
+                i for i, byte in enumerate(text[:length]) if chr(byte).isalpha()
+            ]
+            for i, byte in enumerate(text[:length]):
+                if not chr(byte).isalpha():
+                    self.assertEqual(output[i], byte)
+            self.assertEqual(
+                bytes(output[i] for i in letter_indexes).upper(),
+                encoded_letters.encode(),
+            )
+            self.assertEqual(
+                [chr(output[i]).islower() for i in letter_indexes],
+                [chr(letters[i]).islower() for i in range(len(letters))],
+            )
+
+        with self.assertRaises(EnigmaMachineError):
+            enigma_machine.encode_bytes(b"HELLO", bytearray(4))
+
+    def test_encode_file(self):
+        text = b"Hello, World!\n" * 10000
+        arguments = ["--rotors", "I", "II", "III", "--rings", "1", "1", "1"]
+        arguments += ["--positions", "A", "A", "Z", "--reflector", "B"]
+        arguments += ["--leads", "HL", "MO", "AJ"]
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ["in", "out", "back"]]
+            with open(paths[0], "wb") as file:
+                file.write(text)
+
+            self.assertEqual(enigma_cli.main([paths[0], paths[1]] + arguments), 0)
+            self.assertEqual(enigma_cli.main([paths[1], paths[2]] + arguments), 0)
+
+            with open(paths[1], "rb") as file:
+                encoded_text = file.read()
+            with open(paths[2], "rb") as file:
+                self.assertEqual(file.read(), text)
+
+            self.assertEqual(
+                encoded_text[:13],
+                EnigmaMachineFactory.create_enigma_machine(
+                    ["I", "II", "III"],
+                    ["1", "1", "1"],
+                    ["A", "A", "Z"],
+                    reflector_name="B",
+                    lead_settings=["HL", "MO", "AJ"],
+                ).encode_bytes(b"Hello, World!"),
+            )
+
+            custom_reflector = ["--custom-reflector", "YRUHQSLDPXNGOKMIEBFZCWVJAT"]
+            self.assertEqual(
+                enigma_cli.main(
+                    [paths[0], paths[2]]
+                    + arguments[:12]
+                    + custom_reflector
+                    + arguments[-4:]
+                ),
+                0,
+            )
+            with open(paths[2], "rb") as file:
+                self.assertEqual(file.read(), encoded_text)
+
+            # an empty file gives an empty file
+            open(paths[0], "wb").close()
+            self.assertEqual(enigma_cli.main([paths[0], paths[1]] + arguments), 0)
+            self.assertEqual(os.path.getsize(paths[1]), 0)
+
+            self.assertEqual(
+                enigma_cli.main([paths[0], paths[1]] + arguments[:-3] + ["AA"]), 1
+            )
+
+            # custom reflectors that aren't valid are reported rather than crashing
+            for mapping in [
+                "abcdefghijklmnopqrstuvwxyz",
+                "ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+                "YRUHQSLDPXNGOKMIEBFZCWVJTA",
+                "YRUHQSLDPXNGOKMIEBFZCWVJ",
+            ]:
+                with contextlib.redirect_stderr(io.StringIO()) as error_output:
+                    self.assertEqual(
+                        enigma_cli.main(
+                            [paths[0], paths[2]]
+                            + arguments[:12]
+                            + ["--custom-reflector", mapping]
+                            + arguments[-4:]
+                        ),
+                        1,
+                    )
+                self.assertTrue(
+                    error_output.getvalue().startswith(
+                        "error: The custom reflector must be 26 uppercase letters"
+                    )
+                )
+
+            # encoding a file into itself would truncate it before it is read
+            with open(paths[2], "wb") as file:
+                file.write(text)
+            self.assertEqual(enigma_cli.main([paths[2], paths[2]] + arguments), 1)
+            with open(paths[2], "rb") as file:
+                self.assertEqual(file.read(), text)
+
     def test_invalid_rotor_cradle_added(self):
         lead = PlugLead("AG")
         lead_two = PlugLead("BD")
@@ -533,4 +1046,1075 @@ class TestEnigmaCodeCracker(unittest.TestCase):
             lead_settings=[["UG", "IE", "PO", "NX", "WT"]],
         )
 
-        self.assertGreaterEqual(len(enigma_code_cracker.valid_enigma_machines), 1)
+        self.assertGreaterEqual(
+            enigma_code_cracker.number_of_enigma_machines_checked, 1
+        )
+
+    def test_enigma_machines_are_created_lazily(self):
+        reflectors_generated = []
+
+        def generate_reflectors():
+            for reflector_name in ["A", "B", "C"]:
+                reflectors_generated.append(reflector_name)
+                yield {"name": reflector_name}
+
+        def get_settings():
+            return dict(
+                rotor_names=[["V", "III", "IV"]],
+                ring_settings=[["24", "12", "10"]],
+                position_settings=get_potential_position_settings("SWU", 3),
+                reflectors=generate_reflectors(),
+                lead_settings=get_potential_lead_settings(
+                    ["WP", "RJ", "VF", "HN", "CG", "BS", "AT"], ["I"]
+                ),
+            )
+
+        keyspace = Keyspace(**get_settings())
+
+        # every setting of each dimension is read into the keyspace (so combinations
+        # can be found from their rank), but only the combinations are lazy: an
+        # enigma machine is only created when it is asked for
+        self.assertEqual(reflectors_generated, ["A", "B", "C"])
+        with unittest.mock.patch.object(
+            EnigmaMachineFactory,
+            "create_enigma_machine",
+            wraps=EnigmaMachineFactory.create_enigma_machine,
+        ) as create_enigma_machine:
+            enigma_machines = create_valid_enigma_machines(keyspace)
+            self.assertEqual(create_enigma_machine.call_count, 0)
+
+            next(enigma_machines)
+            self.assertEqual(create_enigma_machine.call_count, 1)
+
+        enigma_code_cracker = EnigmaCodeCracker(
+            cribs=["TUTOR"],
+            code="SDNTVTPHRBNWTLMZTQKZGADDQYPFNHBPNHCQGBGMZPZLUAVGDQVYRBFYYEIXQWVTHXGNW",
+            **get_settings(),
+        )
+
+        self.assertEqual(
+            enigma_code_cracker.number_of_enigma_machines_checked, 3 * 27 * 11
+        )
+        self.assertIn(
+            "NOTUTORSWEREHARMEDNORIMPLICATEDOFCRIMESDURINGTHEMAKINGOFTHESEEXAMPLES",
+            [
+                potential_solution["decoded_string"]
+                for potential_solution in enigma_code_cracker.potential_solutions
+            ],
+        )
+
+    def test_cracking_in_parallel(self):
+        settings = dict(
+            cribs=["TUTOR"],
+            code="SDNTVTPHRBNWTLMZTQKZGADDQYPFNHBPNHCQGBGMZPZLUAVGDQVYRBFYYEIXQWVTHXGNW",
+            rotor_names=[["V", "III", "IV"]],
+            ring_settings=[["24", "12", "10"]],
+            position_settings=[["S", "W", "U"]],
+            reflectors=[{"name": "A"}, {"name": "B"}],
+        )
+        enigma_code_cracker = EnigmaCodeCracker(
+            **settings,
+            lead_settings=get_potential_lead_settings(
+                ["WP", "RJ", "VF", "HN", "CG", "BS"], ["A", "I"]
+            ),
+        )
+        enigma_code_cracker_in_parallel = EnigmaCodeCracker(
+            **settings,
+            lead_settings=get_potential_lead_settings(
+                ["WP", "RJ", "VF", "HN", "CG", "BS"], ["A", "I"]
+            ),
+            workers=2,
+            chunk_size=7,
+        )
+
+        self.assertEqual(
+            enigma_code_cracker_in_parallel.number_of_enigma_machines_checked,
+            enigma_code_cracker.number_of_enigma_machines_checked,
+        )
+        self.assertEqual(
+            [
+                str(potential_solution)
+                for potential_solution in enigma_code_cracker_in_parallel.potential_solutions
+            ],
+            [
+                str(potential_solution)
+                for potential_solution in enigma_code_cracker.potential_solutions
+            ],
+        )
+
+    def test_invalid_workers(self):
+        with self.assertRaises(EnigmaCodeCrackerError):
+            EnigmaCodeCracker(
+                cribs=["TESTING"],
+                code="TESTINGAGOODCASE",
+                rotor_names=[["V", "II", "IV"]],
+                ring_settings=[["6", "18", "7"]],
+                position_settings=[["A", "J", "L"]],
+                reflectors=[{"name": "B"}],
+                lead_settings=[["UG", "IE", "PO", "NX", "WT"]],
+                workers=0,
+            )
+
+    def test_checkpoint_and_resume(self):
+        settings = dict(
+            cribs=["UNIVERSITY"],
+            code="CMFSUPKNCBMUYEQVVDYKLRQZTPUFHSWWAKTUGXMPAMYAFITXIJKMH",
+            rotor_names=[["Beta", "I", "III"]],
+            ring_settings=[["24", "2", "10"]],
+            position_settings=list(get_potential_position_settings("GJM", 3)),
+            reflectors=[{"name": "B"}],
+            lead_settings=[["VH", "PT", "ZG", "BJ", "EY", "FS"]],
+            chunk_size=5,
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_path = os.path.join(directory, "checkpoint")
+            enigma_code_cracker = EnigmaCodeCracker(
+                **settings, checkpoint_path=checkpoint_path, checkpoint_interval=0
+            )
+
+            with open(checkpoint_path, "rb") as checkpoint_file:
+                checkpoint = pickle.load(checkpoint_file)
+
+            self.assertEqual(checkpoint["next_rank"], 27)
+            self.assertEqual(checkpoint["number_of_enigma_machines_checked"], 27)
+            self.assertEqual(len(checkpoint["potential_solutions"]), 1)
+
+            # pretend that cracking was interrupted part of the way through
+            checkpoint["next_rank"] = 10
+            checkpoint["number_of_enigma_machines_checked"] = 10
+            checkpoint["potential_solutions"] = []
+            with open(checkpoint_path, "wb") as checkpoint_file:
+                pickle.dump(checkpoint, checkpoint_file)
+
+            resumed_enigma_code_cracker = EnigmaCodeCracker(
+                **settings, checkpoint_path=checkpoint_path, resume=True
+            )
+
+            self.assertEqual(
+                resumed_enigma_code_cracker.number_of_enigma_machines_checked, 27
+            )
+            self.assertEqual(
+                [
+                    str(potential_solution)
+                    for potential_solution in resumed_enigma_code_cracker.potential_solutions
+                ],
+                [
+                    str(potential_solution)
+                    for potential_solution in enigma_code_cracker.potential_solutions
+                ],
+            )
+
+            with self.assertRaises(EnigmaCodeCrackerError):
+                EnigmaCodeCracker(
+                    **{**settings, "cribs": ["BATH"]},
+                    checkpoint_path=checkpoint_path,
+                    resume=True,
+                )
+
+            # a keyspace of the same size with different settings in it
+            with self.assertRaises(EnigmaCodeCrackerError):
+                EnigmaCodeCracker(
+                    **{**settings, "ring_settings": [["24", "2", "11"]]},
+                    checkpoint_path=checkpoint_path,
+                    resume=True,
+                )
+
+    def test_stopping_early(self):
+        settings = dict(
+            cribs=["TUTOR"],
+            code="SDNTVTPHRBNWTLMZTQKZGADDQYPFNHBPNHCQGBGMZPZLUAVGDQVYRBFYYEIXQWVTHXGNW",
+            rotor_names=[["V", "III", "IV"]],
+            ring_settings=[["24", "12", "10"]],
+            position_settings=[["S", "W", "U"]],
+            reflectors=[{"name": "A"}],
+            chunk_size=10,
+        )
+        all_lead_settings = list(
+            get_potential_lead_settings(
+                ["WP", "RJ", "VF", "HN", "CG", "BS"], ["A", "I"]
+            )
+        )
+        enigma_code_cracker = EnigmaCodeCracker(
+            **settings, lead_settings=all_lead_settings
+        )
+
+        self.assertGreater(len(enigma_code_cracker.potential_solutions), 2)
+        self.assertEqual(enigma_code_cracker.get_keyspace_coverage(), 1)
+        self.assertEqual(enigma_code_cracker.stop_reason, "finished")
+
+        for max_solutions in [1, 2]:
+            enigma_code_cracker_with_max_solutions = EnigmaCodeCracker(
+                **settings, lead_settings=all_lead_settings, max_solutions=max_solutions
+            )
+
+            self.assertEqual(
+                str(enigma_code_cracker_with_max_solutions.potential_solutions),
+                str(enigma_code_cracker.potential_solutions[:max_solutions]),
+            )
+            self.assertEqual(
+                enigma_code_cracker_with_max_solutions.stop_reason, "max_solutions"
+            )
+            self.assertLess(
+                enigma_code_cracker_with_max_solutions.get_keyspace_coverage(), 1
+            )
+
+        enigma_code_cracker_with_candidate_budget = EnigmaCodeCracker(
+            **settings, lead_settings=all_lead_settings, candidate_budget=25
+        )
+
+        self.assertEqual(enigma_code_cracker_with_candidate_budget.next_rank, 25)
+        self.assertEqual(
+            enigma_code_cracker_with_candidate_budget.stop_reason, "candidate_budget"
+        )
+
+        enigma_code_cracker_with_time_budget = EnigmaCodeCracker(
+            **settings, lead_settings=all_lead_settings, time_budget=0
+        )
+
+        self.assertEqual(enigma_code_cracker_with_time_budget.next_rank, 10)
+        self.assertEqual(
+            enigma_code_cracker_with_time_budget.stop_reason, "time_budget"
+        )
+
+    def test_pruning_crib_positions_finds_the_same_solutions(self):
+        code = "SDNTVTPHRBNWTLMZTQKZGADDQYPFNHBPNHCQGBGMZPZLUAVGDQVYRBFYYEIXQWVTHXGNW"
+        cribs = ["TUTOR", "EXAMPLES"]
+        keyspace = Keyspace(
+            rotor_names=[["V", "III", "IV"]],
+            ring_settings=[["24", "12", "10"]],
+            position_settings=get_potential_position_settings("SWU", 3),
+            reflectors=[{"name": "A"}, {"name": "B"}],
+            lead_settings=get_potential_lead_settings(
+                ["WP", "RJ", "VF", "HN", "CG", "BS", "AT"], ["I"]
+            ),
+        )
+
+        expected_ranks = [
+            rank
+            for rank, decoded_string in (
+                (rank, enigma_machine.encode(code))
+                for rank, enigma_machine in create_valid_enigma_machines(keyspace)
+            )
+            for crib in cribs
+            if crib in decoded_string
+        ]
+        ranks = [
+            rank
+            for rank, _ in get_potential_solutions(
+                cribs, code, create_valid_enigma_machines(keyspace)
+            )
+        ]
+
+        self.assertGreater(len(expected_ranks), 0)
+        self.assertEqual(ranks, expected_ranks)
+
+        # the cribs are only looked for at the positions they are given, whether the
+        # code is decoded one enigma machine at a time or in batches
+        batch_sizes = [None, 4] if is_batched_engine_available() else [None]
+        for batch_size in batch_sizes:
+            self.assertEqual(
+                list(
+                    get_potential_solutions(
+                        cribs,
+                        code,
+                        create_valid_enigma_machines(keyspace),
+                        batch_size,
+                        crib_positions={crib: [] for crib in cribs},
+                    )
+                ),
+                [],
+            )
+
+        enigma_code_cracker = EnigmaCodeCracker(
+            cribs=cribs,
+            code=code,
+            rotor_names=[["V", "III", "IV"]],
+            ring_settings=[["24", "12", "10"]],
+            position_settings=[["S", "W", "U"]],
+            reflectors=[{"name": "A"}],
+            lead_settings=[["WP", "RJ", "VF", "HN", "CG", "BS", "AT", "IE"]],
+        )
+
+        self.assertEqual(
+            enigma_code_cracker.crib_positions["TUTOR"],
+            get_possible_crib_positions(code, "TUTOR"),
+        )
+        self.assertNotIn(3, enigma_code_cracker.crib_positions["TUTOR"])
+
+    def test_sweeping_positions(self):
+        settings = dict(
+            cribs=["UNIVERSITY"],
+            code="CMFSUPKNCBMUYEQVVDYKLRQZTPUFHSWWAKTUGXMPAMYAFITXIJKMH",
+            rotor_names=[["Beta", "I", "III"]],
+            ring_settings=[["24", "2", "10"]],
+            reflectors=[{"name": "B"}, {"name": "C"}],
+            lead_settings=[["VH", "PT", "ZG", "BJ", "EY", "FS"]],
+            chunk_size=100,
+        )
+        position_settings = list(get_potential_position_settings("GJMN", 3))
+        enigma_code_cracker = EnigmaCodeCracker(
+            **settings, position_settings=position_settings
+        )
+        enigma_code_cracker_sweeping_positions = EnigmaCodeCracker(
+            **settings, position_settings=position_settings, sweep_positions=True
+        )
+
+        self.assertEqual(
+            [
+                potential_solution["decoded_string"]
+                for potential_solution in enigma_code_cracker.potential_solutions
+            ],
+            ["IHOPEYOUAREENJOYINGTHEUNIVERSITYOFBATHEXPERIENCESOFAR"],
+        )
+        self.assertEqual(
+            str(enigma_code_cracker_sweeping_positions.potential_solutions),
+            str(enigma_code_cracker.potential_solutions),
+        )
+        self.assertEqual(
+            len(enigma_code_cracker_sweeping_positions.position_sweeps.position_sweeps),
+            2,
+        )
+
+        with self.assertRaises(EnigmaCodeCrackerError):
+            EnigmaCodeCracker(
+                **settings,
+                position_settings=position_settings,
+                sweep_positions=True,
+                batch_size=10,
+            )
+
+
+class TestCrackingSecretsHelpers(unittest.TestCase):
+    def test_get_chunks(self):
+        self.assertEqual(list(get_chunks(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(list(get_chunks([], 3)), [])
+
+    def test_get_possible_crib_positions(self):
+        self.assertEqual(get_possible_crib_positions("ABCAB", "AB"), [1, 2])
+        self.assertEqual(get_possible_crib_positions("ABCAB", "BA"), [0, 3])
+        self.assertEqual(get_possible_crib_positions("AAAA", "A"), [])
+        self.assertEqual(get_possible_crib_positions("AB", "ABC"), [])
+
+    def test_decode_if_cribs_can_match(self):
+        random_generator = random.Random(0)
+        cribs = ["HELLO", "WORLD", "ROT"]
+
+        for _ in range(200):
+            code = "".join(random_generator.choices("DEHLORTW", k=30))
+            decoded_string = "".join(random_generator.choices("DEHLORTW", k=30))
+            crib_checks = get_crib_checks(cribs, code)
+            cribs_can_match = any(
+                decoded_string[position : position + len(crib)] == crib
+                for crib in cribs
+                for position in get_possible_crib_positions(code, crib)
+            )
+
+            self.assertEqual(
+                decode_if_cribs_can_match(
+                    lambda key_press, pin: ord(decoded_string[key_press]) - 65,
+                    [ord(char) - 65 for char in code],
+                    crib_checks,
+                ),
+                decoded_string if cribs_can_match else None,
+            )
+
+
+class TestKeystreamCache(unittest.TestCase):
+    def test_encoding_with_keystream_cache(self):
+        keystream_cache = KeystreamCache()
+
+        for position_settings in [["A", "A", "Z"], ["Q", "E", "V"], ["M", "D", "U"]]:
+            enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+                ["I", "II", "III"],
+                ["1", "1", "1"],
+                position_settings,
+                lead_settings=["HL", "MO", "AJ", "CX", "BZ"],
+                reflector_name="B",
+            )
+            enigma_machine_with_cache = EnigmaMachineFactory.create_enigma_machine(
+                ["I", "II", "III"],
+                ["1", "1", "1"],
+                position_settings,
+                lead_settings=["HL", "MO", "AJ", "CX", "BZ"],
+                reflector_name="B",
+                keystream_cache=keystream_cache,
+            )
+            plaintext = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 30
+
+            self.assertEqual(
+                enigma_machine_with_cache.encode(plaintext),
+                enigma_machine.encode(plaintext),
+            )
+
+        self.assertEqual(len(keystream_cache), 1)
+
+    def test_encoding_four_rotors_with_keystream_cache(self):
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["IV", "V", "Beta", "I"],
+            ["18", "24", "3", "5"],
+            ["E", "Z", "G", "P"],
+            lead_settings=["PC", "XZ", "FM", "QA", "ST", "NB", "HY", "OR", "EV", "IU"],
+            reflector_name="A",
+            keystream_cache=KeystreamCache(),
+        )
+
+        self.assertEqual(
+            enigma_machine.encode(
+                "BUPXWJCDPFASXBDHLBBIBSRNWCSZXQOLBNXYAXVHOGCUUIBCVMPUZYUUKHI"
+            ),
+            "CONGRATULATIONSONPRODUCINGYOURWORKINGENIGMAMACHINESIMULATOR",
+        )
+
+    def test_shared_keystream(self):
+        settings = dict(
+            rotor_names=["V", "II", "Beta", "IV"],
+            ring_settings=["3", "18", "7", "1"],
+            position_settings=["Q", "D", "V", "Z"],
+        )
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            **settings, reflector_name="C"
+        )
+        other_enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            **settings, reflector_name="B"
+        )
+
+        self.assertEqual(
+            get_wheel_settings(enigma_machine.rotor_cradle),
+            get_wheel_settings(other_enigma_machine.rotor_cradle),
+        )
+
+        keystream = Keystream(other_enigma_machine.rotor_cradle)
+        reflector_pins = enigma_machine.rotor_cradle.reflector.get_pins()
+
+        for key_press in range(700):
+            pin = key_press % 26
+            right_to_left, left_to_right = keystream.get_halves(key_press)
+            encoded_pin = enigma_machine.rotor_cradle.encode_pin(pin)
+
+            self.assertEqual(
+                encoded_pin, left_to_right[reflector_pins[right_to_left[pin]]]
+            )
+            self.assertNotEqual(encoded_pin, keystream.get_permutation(key_press)[pin])
+
+        self.assertNotEqual(
+            get_wheel_settings(enigma_machine.rotor_cradle),
+            get_wheel_settings(
+                EnigmaMachineFactory.create_enigma_machine(
+                    **settings, reflector_name="C"
+                ).rotor_cradle
+            ),
+        )
+
+    def test_keystream_matches_enigma_machine(self):
+        settings = dict(
+            rotor_names=["I", "II", "III"],
+            ring_settings=["1", "1", "1"],
+            position_settings=["A", "A", "Z"],
+            reflector_name="B",
+        )
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(**settings)
+        keystream = Keystream(
+            EnigmaMachineFactory.create_enigma_machine(**settings).rotor_cradle
+        )
+
+        for key_press in range(100):
+            self.assertEqual(
+                enigma_machine.rotor_cradle.encode_pin(key_press % 26),
+                keystream.get_permutation(key_press)[key_press % 26],
+            )
+
+    def test_shared_keystreams(self):
+        shared_keystreams = SharedKeystreams(maximum_number_of_wheel_settings=1)
+
+        def create_rotor_cradle(position_settings, reflector_name="B"):
+            return EnigmaMachineFactory.create_enigma_machine(
+                ["I", "II", "III"], ["1", "1", "1"], position_settings, reflector_name
+            ).rotor_cradle
+
+        self.assertIsNone(shared_keystreams.get_keystream(create_rotor_cradle("AAA")))
+
+        keystream = shared_keystreams.get_keystream(create_rotor_cradle("AAA", "C"))
+        self.assertIsInstance(keystream, Keystream)
+        self.assertIs(
+            shared_keystreams.get_keystream(create_rotor_cradle("AAA")), keystream
+        )
+
+        self.assertIsNone(shared_keystreams.get_keystream(create_rotor_cradle("AAB")))
+        self.assertEqual(len(shared_keystreams), 1)
+        self.assertIsNone(shared_keystreams.get_keystream(create_rotor_cradle("AAA")))
+
+        with self.assertRaises(KeystreamCacheError):
+            SharedKeystreams(maximum_number_of_wheel_settings=0)
+
+    def test_position_sweep_windows(self):
+        for rotor_names, position_settings in [
+            (["I", "II", "III"], it.product("AEQUV", "AEQUV", "AEQUV")),
+            (["Gamma", "IV", "Beta"], it.product("AJ", "AJZ", "AJZ")),
+            (["Beta", "I", "II", "III"], it.product("C", "ADQ", "ADE", "AQV")),
+        ]:
+            position_sweeps = PositionSweeps(window_length=60)
+
+            for position_setting in position_settings:
+                enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+                    rotor_names,
+                    ["3"] * len(rotor_names),
+                    position_setting,
+                    reflector_name="B",
+                )
+                rotor_cradle = enigma_machine.rotor_cradle
+                keystream, offset = position_sweeps.get_window(rotor_cradle)
+
+                for key_press in range(60):
+                    pin = key_press % 26
+                    self.assertEqual(
+                        rotor_cradle.encode_pin(pin),
+                        keystream[(offset + key_press) * 26 + pin],
+                    )
+
+            self.assertEqual(len(position_sweeps.position_sweeps), 1)
+
+    def test_next_states_follow_rotor_stepping(self):
+        rotor_cradle = RotorCradle()
+        rotor_cradle.add_rotor(Rotor("II"))
+        rotor_cradle.add_rotor(Rotor("I"))
+        rotor_cradle.add_rotor(Rotor("V"))
+        rotor_cradle.add_reflector(Reflector("C"))
+        keystream_table = KeystreamTable(rotor_cradle)
+
+        for rotor_positions in [(4, 16, 0), (3, 16, 25), (4, 15, 7), (25, 25, 25)]:
+            for rotor, position in zip(rotor_cradle.rotors, rotor_positions):
+                rotor.position = position
+
+            rotor_cradle.step_rotors()
+
+            self.assertEqual(
+                keystream_table.next_states[get_state_index(rotor_positions)],
+                get_state_index(rotor_cradle.get_rotor_positions()),
+            )
+
+    def test_least_recently_used_tables_are_evicted(self):
+        keystream_cache = KeystreamCache(memory_budget=1)
+
+        for rotor_names in [["I", "II", "III"], ["II", "III", "IV"]]:
+            EnigmaMachineFactory.create_enigma_machine(
+                rotor_names,
+                ["1", "1", "1"],
+                ["A", "A", "A"],
+                reflector_name="B",
+                keystream_cache=keystream_cache,
+            )
+
+        self.assertEqual(len(keystream_cache), 1)
+        self.assertEqual(
+            next(iter(keystream_cache.keystream_tables.values())).key[0],
+            ("IV", "III", "II"),
+        )
+
+    def test_invalid_memory_budget(self):
+        with self.assertRaises(KeystreamCacheError):
+            KeystreamCache(memory_budget=0)
+
+
+@unittest.skipUnless(is_batched_engine_available(), "NumPy is not installed")
+class TestBatchedEnigmaEngine(unittest.TestCase):
+    def test_encoding_matches_enigma_machine(self):
+        settings = [
+            (["I", "II", "III"], ["1", "1", "1"], ["A", "A", "Z"], "B", []),
+            (["I", "II", "III"], ["1", "1", "1"], ["Q", "E", "V"], "B", ["AZ"]),
+            (
+                ["IV", "V", "Beta", "I"],
+                ["18", "24", "3", "5"],
+                ["E", "Z", "G", "P"],
+                "A",
+                ["PC", "XZ", "FM", "QA", "ST", "NB", "HY", "OR", "EV", "IU"],
+            ),
+            (
+                ["II", "Gamma", "IV"],
+                ["24", "8", "20"],
+                ["E", "M", "Y"],
+                "C",
+                ["FH", "TS", "BE", "UQ", "KD", "AL"],
+            ),
+        ]
+        code = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 25
+
+        def create_enigma_machines():
+            return [
+                EnigmaMachineFactory.create_enigma_machine(
+                    rotor_names,
+                    ring_settings,
+                    position_settings,
+                    reflector_name=reflector_name,
+                    lead_settings=lead_settings,
+                )
+                for (
+                    rotor_names,
+                    ring_settings,
+                    position_settings,
+                    reflector_name,
+                    lead_settings,
+                ) in settings
+            ]
+
+        batched_enigma_engine = BatchedEnigmaEngine(create_enigma_machines())
+        encoded = batched_enigma_engine.encode(code)
+
+        for pins, enigma_machine in zip(encoded, create_enigma_machines()):
+            self.assertEqual(convert_pins_to_string(pins), enigma_machine.encode(code))
+
+    def test_find_cribs(self):
+        enigma_machines = [
+            EnigmaMachineFactory.create_enigma_machine(
+                ["Beta", "Gamma", "V"],
+                ["4", "2", "14"],
+                ["M", "J", "M"],
+                reflector_name=reflector_name,
+                lead_settings=["KI", "XN", "FL"],
+            )
+            for reflector_name in ["A", "B", "C"]
+        ]
+        batched_enigma_engine = BatchedEnigmaEngine(enigma_machines)
+        decoded = batched_enigma_engine.encode(
+            "DMEXBMKYCVPNQBEDHXVPZGKMTFFBJRPJTLHLCHOTKOYXGGHZ"
+        )
+        crib_matches = batched_enigma_engine.find_cribs(
+            decoded,
+            ["SECRETS", "NICEWORK", "THISISAVERYLONGCRIBTHATWILLNEVERFITINTHECODE"],
+        )
+
+        self.assertEqual(
+            crib_matches.tolist(),
+            [[False, False, True], [False, False, True], [False, False, False]],
+        )
+
+        # a crib isn't looked for at positions it can't be at
+        crib_matches = batched_enigma_engine.find_cribs(
+            decoded, ["SECRETS", "NICEWORK"], {"SECRETS": [], "NICEWORK": []}
+        )
+
+        self.assertEqual(
+            crib_matches.tolist(), [[False, False, False], [False, False, False]]
+        )
+
+    def test_no_enigma_machines(self):
+        with self.assertRaises(BatchedEnigmaEngineError):
+            BatchedEnigmaEngine([])
+
+    def test_code_cracker_in_batches(self):
+        enigma_code_cracker = EnigmaCodeCracker(
+            cribs=["UNIVERSITY"],
+            code="CMFSUPKNCBMUYEQVVDYKLRQZTPUFHSWWAKTUGXMPAMYAFITXIJKMH",
+            rotor_names=[["Beta", "I", "III"]],
+            ring_settings=[["24", "2", "10"]],
+            position_settings=get_potential_position_settings("GJM", 3),
+            reflectors=[{"name": "B"}],
+            lead_settings=[["VH", "PT", "ZG", "BJ", "EY", "FS"]],
+            batch_size=5,
+        )
+
+        self.assertEqual(len(enigma_code_cracker.potential_solutions), 1)
+        self.assertEqual(
+            enigma_code_cracker.potential_solutions[0]["decoded_string"],
+            "IHOPEYOUAREENJOYINGTHEUNIVERSITYOFBATHEXPERIENCESOFAR",
+        )
+
+
+class TestKeyspace(unittest.TestCase):
+    def setUp(self):
+        self.settings = dict(
+            rotor_names=[["I", "II", "III"], ["IV", "V", "Beta"]],
+            ring_settings=[["1", "1", "1"], ["2", "2", "2"], ["3", "3", "3"]],
+            position_settings=list(get_potential_position_settings("AB", 3)),
+            reflectors=[{"name": "A"}, {"name": "B"}],
+            lead_settings=[["AB"], ["CD"], ["EF"]],
+        )
+        self.keyspace = Keyspace(**self.settings)
+        self.all_settings = list(
+            it.product(
+                self.settings["reflectors"],
+                self.settings["ring_settings"],
+                self.settings["rotor_names"],
+                self.settings["position_settings"],
+                self.settings["lead_settings"],
+            )
+        )
+
+    def test_length(self):
+        self.assertEqual(len(self.keyspace), 2 * 3 * 2 * 8 * 3)
+        self.assertEqual(len(self.keyspace), len(self.all_settings))
+
+    def test_settings_by_rank(self):
+        for rank, settings in enumerate(self.all_settings):
+            self.assertEqual(self.keyspace[rank], settings)
+
+        self.assertEqual(self.keyspace[-1], self.all_settings[-1])
+        self.assertEqual(list(self.keyspace), self.all_settings)
+
+        with self.assertRaises(IndexError):
+            self.keyspace[len(self.all_settings)]
+
+    def test_slicing(self):
+        keyspace_range = self.keyspace[100:150]
+
+        self.assertEqual(len(keyspace_range), 50)
+        self.assertEqual((keyspace_range.start, keyspace_range.stop), (100, 150))
+        self.assertEqual(list(keyspace_range), self.all_settings[100:150])
+        self.assertEqual(list(keyspace_range[10:20]), self.all_settings[110:120])
+        self.assertEqual(len(self.keyspace[200:]), len(self.all_settings) - 200)
+        self.assertEqual(len(self.keyspace[500:]), 0)
+
+        with self.assertRaises(KeyspaceError):
+            self.keyspace[::2]
+
+    def test_empty_dimension(self):
+        lead_settings = get_potential_lead_settings(["AB"], ["C"])
+        Keyspace(**{**self.settings, "lead_settings": lead_settings})
+
+        # the lead settings were used up by the first keyspace
+        with self.assertRaises(KeyspaceError):
+            Keyspace(**{**self.settings, "lead_settings": lead_settings})
+
+        with self.assertRaises(KeyspaceError):
+            Keyspace(**{**self.settings, "reflectors": []})
+
+    def test_ranges(self):
+        ranges = list(self.keyspace.get_ranges(100))
+
+        self.assertEqual(ranges, [(0, 100), (100, 200), (200, 288)])
+        self.assertEqual(list(self.keyspace[250:].get_ranges(100)), [(250, 288)])
+
+
+class TestBombe(unittest.TestCase):
+    def setUp(self):
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["II", "IV", "V"],
+            ["2", "21", "12"],
+            ["B", "L", "A"],
+            reflector_name="B",
+            lead_settings=["AB", "CD", "EF", "GH", "IJ", "KL", "MN", "OP", "QR", "ST"],
+        )
+        self.code = enigma_machine.encode(
+            "WETTERVORHERSAGEBISKAYAHEUTEKLARMORGENREGENUNDWIND"
+        )
+        self.crib = "WETTERVORHERSAGE"
+
+    def test_menu(self):
+        menu = Menu(self.crib, self.code, 0)
+
+        self.assertEqual(menu.length, len(self.crib))
+        self.assertEqual(len(menu.test_pins), 1)
+        self.assertIn((ord(self.code[0]) - 65, 0), menu.connections[ord("W") - 65])
+
+        with self.assertRaises(BombeError):
+            Menu(self.crib, self.code, len(self.code))
+
+        with self.assertRaises(BombeError):
+            Menu(self.code[3:6], self.code, 3)
+
+    def test_deducing_the_plugboard(self):
+        bombe = Bombe(Menu(self.crib, self.code, 0))
+        stops = bombe.get_stops(
+            ["II", "IV", "V"], ["2", "21", "12"], ["B", "L", "A"], {"name": "B"}
+        )
+
+        self.assertEqual(len(stops), 1)
+        self.assertEqual(
+            stops[0]["lead_settings"],
+            ["AB", "EF", "GH", "IJ", "KL", "MN", "OP", "QR"],
+        )
+        self.assertEqual(stops[0]["letters_without_leads"], "W")
+
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["II", "IV", "V"],
+            ["2", "21", "12"],
+            ["B", "L", "A"],
+            reflector_name="B",
+            lead_settings=stops[0]["lead_settings"] + ["CD", "ST"],
+        )
+        self.assertTrue(enigma_machine.encode(self.code).startswith(self.crib))
+
+    def test_contradictory_stops_are_discarded(self):
+        bombe = Bombe(Menu(self.crib, self.code, 0), keystream_cache=KeystreamCache())
+        stops = list(
+            bombe.run(
+                [["II", "IV", "V"]],
+                [["2", "21", "12"]],
+                it.product("AB", string.ascii_uppercase, string.ascii_uppercase),
+                [{"name": "B"}],
+            )
+        )
+
+        self.assertLess(len(stops), 5)
+        self.assertIn(("B", "L", "A"), [stop["position_settings"] for stop in stops])
+
+    def test_known_lead_settings(self):
+        stops = Bombe(
+            Menu(self.crib, self.code, 0), known_lead_settings=["AC"]
+        ).get_stops(
+            ["II", "IV", "V"], ["2", "21", "12"], ["B", "L", "A"], {"name": "B"}
+        )
+
+        self.assertEqual(stops, [])
+
+        with self.assertRaises(BombeError):
+            Bombe(Menu(self.crib, self.code, 0), known_lead_settings=["AC", "AD"])
+
+
+class TestCiphertextOnlyCracker(unittest.TestCase):
+    def setUp(self):
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["II", "IV", "V"],
+            ["1", "1", "1"],
+            ["B", "L", "A"],
+            reflector_name="B",
+        )
+        self.code = enigma_machine.encode(
+            "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOGANDTHENRANAWAYINTOTHEFOREST"
+            "WHEREITWASNEVERSEENAGAINBYANYONEEXCEPTTHEOLDMANWHOLIVEDTHERE"
+        )
+
+    def test_index_of_coincidence(self):
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["II", "IV", "V"],
+            ["1", "1", "1"],
+            ["B", "L", "A"],
+            reflector_name="B",
+        )
+        decoded_string = enigma_machine.encode(self.code)
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["II", "IV", "V"],
+            ["1", "1", "1"],
+            ["B", "L", "A"],
+            reflector_name="B",
+        )
+        coincidences = count_coincidences(
+            enigma_machine, convert_string_to_pins(self.code)
+        )
+
+        self.assertEqual(
+            coincidences,
+            sum(
+                decoded_string.count(char) * (decoded_string.count(char) - 1)
+                for char in string.ascii_uppercase
+            ),
+        )
+        self.assertEqual(get_index_of_coincidence(coincidences, 1), 0)
+
+    def test_finding_the_settings_without_a_crib(self):
+        ciphertext_only_cracker = CiphertextOnlyCracker(
+            self.code,
+            rotor_names=[["II", "IV", "V"]],
+            position_settings=get_potential_position_settings("ABKL", 3),
+            ring_settings=[["1", "1", "1"]],
+            reflectors=[{"name": "B"}],
+            number_of_candidates=3,
+        )
+
+        self.assertEqual(ciphertext_only_cracker.number_of_enigma_machines_checked, 64)
+        self.assertEqual(len(ciphertext_only_cracker.candidates), 3)
+        self.assertTrue(
+            ciphertext_only_cracker.candidates[0]["decoded_string"].startswith(
+                "THEQUICKBROWNFOX"
+            )
+        )
+
+        scores = [
+            candidate["index_of_coincidence"]
+            for candidate in ciphertext_only_cracker.candidates
+        ]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_invalid_settings(self):
+        with self.assertRaises(CiphertextOnlyCrackerError):
+            CiphertextOnlyCracker(
+                "abc", [["I", "II", "III"]], [["A", "A", "A"]], [["1", "1", "1"]], []
+            )
+
+        with self.assertRaises(CiphertextOnlyCrackerError):
+            CiphertextOnlyCracker(
+                self.code,
+                [["I", "II", "III"]],
+                [["A", "A", "A"]],
+                [["1", "1", "1"]],
+                [{"name": "B"}],
+                number_of_candidates=0,
+            )
+
+
+class TestPlugboardHillClimber(unittest.TestCase):
+    def setUp(self):
+        self.plain_text = (
+            "THEWEATHERFORECASTFORTOMORROWISCLEARSKIESINTHEMORNINGWITHRAININTHE"
+            "AFTERNOONANDSTRONGWINDSFROMTHENORTHWESTTHESHIPSSHOULDSTAYINTHEHARBOUR"
+            "UNTILTHESTORMHASPASSED"
+        )
+        # a sample of English that doesn't contain the message, like the text a
+        # codebreaker would have to hand
+        self.sample_text = (
+            "It was late in the evening when the old captain came down to the harbour "
+            "to look at the boats. The sea had been rough all week and most of the "
+            "fishermen had stayed at home, mending their nets and talking about the "
+            "price of fish. He walked along the wall until he reached the end, where "
+            "the light was turning slowly against the dark sky, and he stood there for "
+            "a long time listening to the water. In the morning he would have to decide "
+            "whether to sail to the islands or wait for the wind to change. His son "
+            "thought that they should leave at once, before the other crews could reach "
+            "the best grounds, but his wife was afraid of another storm and wanted them "
+            "to stay. The letter from the owners said nothing about the weather, only "
+            "that the cargo must arrive before the end of the month and that the ship "
+            "would not be paid for if it was late. When he finally went home the "
+            "streets were empty and quiet, and only one window was still open, with a "
+            "candle burning on the table inside."
+        )
+        enigma_machine = EnigmaMachineFactory.create_enigma_machine(
+            ["II", "IV", "V"],
+            ["2", "21", "12"],
+            ["B", "L", "A"],
+            reflector_name="B",
+            lead_settings=["AB", "CD", "EF", "GH", "IJ", "KL", "MN"],
+        )
+        self.code = enigma_machine.encode(self.plain_text)
+
+    def test_ngram_table(self):
+        ngram_table = NgramTable("ABAB", n=2)
+
+        self.assertEqual(ngram_table.get_index([1, 2]), 28)
+        self.assertAlmostEqual(
+            ngram_table.score([0, 1, 0]),
+            math.log10(2 / 3) + math.log10(1 / 3),
+        )
+        self.assertLess(ngram_table.score([2, 3]), ngram_table.score([1, 0]))
+
+        with self.assertRaises(NgramTableError):
+            NgramTable("ABAB", n=0)
+
+        with self.assertRaises(NgramTableError):
+            NgramTable("A B", n=3)
+
+    def test_finding_the_plugboard(self):
+        plugboard_hill_climber = PlugboardHillClimber(
+            self.code,
+            ["II", "IV", "V"],
+            ["2", "21", "12"],
+            ["B", "L", "A"],
+            {"name": "B"},
+            NgramTable(self.sample_text, n=2),
+            restarts=20,
+            seed=1,
+        )
+
+        self.assertEqual(
+            plugboard_hill_climber.lead_settings,
+            ["AB", "CD", "EF", "GH", "IJ", "KL", "MN"],
+        )
+        self.assertEqual(plugboard_hill_climber.decoded_string, self.plain_text)
+
+    def test_known_leads_are_kept(self):
+        plugboard_hill_climber = PlugboardHillClimber(
+            self.code,
+            ["II", "IV", "V"],
+            ["2", "21", "12"],
+            ["B", "L", "A"],
+            {"name": "B"},
+            NgramTable(self.sample_text, n=2),
+            known_lead_settings=["AB", "cd", "Ef", "QZ"],
+        )
+
+        for lead_setting in ["AB", "CD", "EF", "QZ"]:
+            self.assertIn(lead_setting, plugboard_hill_climber.lead_settings)
+
+        with self.assertRaises(PlugboardHillClimberError):
+            PlugboardHillClimber(
+                self.code,
+                ["II", "IV", "V"],
+                ["2", "21", "12"],
+                ["B", "L", "A"],
+                {"name": "B"},
+                NgramTable(self.sample_text, n=2),
+                restarts=-1,
+            )
+
+
+class TestMachineConfig(unittest.TestCase):
+    def test_encode_with_config(self):
+        message = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 30
+
+        for settings in [
+            dict(
+                rotor_names=["V", "II", "IV"],
+                ring_settings=["6", "18", "7"],
+                position_settings=["A", "J", "L"],
+                reflector_name="B",
+                lead_settings=["UG", "IE", "PO", "NX", "WT"],
+            ),
+            dict(
+                rotor_names=["Beta", "I", "II", "III"],
+                ring_settings=["2", "6", "18", "7"],
+                position_settings=["C", "A", "D", "U"],
+                reflector_name="C",
+                custom_reflector_mapping=tuple("YRUHQSLDPXNGOKMIEBFZCWVJAT"),
+            ),
+        ]:
+            config = MachineConfig(**settings)
+            enigma_machine = config.create_enigma_machine()
+            encoded_message = enigma_machine.encode(message)
+
+            encoded_string, state = encode_with_config(config, message)
+            self.assertEqual(encoded_string, encoded_message)
+            self.assertEqual(
+                state.positions, enigma_machine.rotor_cradle.get_rotor_positions()
+            )
+
+            # carrying on from the state of the first half gives the second half
+            first_half, state = encode_with_config(config, message[:500])
+            second_half, _ = encode_with_config(config, message[500:], state)
+            self.assertEqual(first_half + second_half, encoded_message)
+
+    def test_configs_are_hashable(self):
+        config = MachineConfig(["I", "II", "III"], ["1", "1", "1"], "AAZ", "B")
+        config_two = MachineConfig(("I", "II", "III"), (1, 1, 1), ("A", "A", "Z"), "B")
+
+        self.assertEqual(config, config_two)
+        self.assertEqual(len({config, config_two}), 1)
+        self.assertEqual(encode_with_config(config, "A")[0], "U")
+
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            config.reflector_name = "C"
+
+    def test_encoding_with_a_shared_config_at_once(self):
+        config = MachineConfig(
+            ["I", "II", "III"], ["1", "1", "1"], ["A", "A", "Z"], "B", None, ["HL"]
+        )
+        messages = [
+            "".join(random.choices(string.ascii_uppercase, k=200)) for _ in range(20)
+        ]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            encoded_messages = list(
+                executor.map(
+                    lambda message: encode_with_config(config, message)[0], messages
+                )
+            )
+
+        self.assertEqual(
+            encoded_messages,
+            [config.create_enigma_machine().encode(message) for message in messages],
+        )
+
+    def test_invalid_configs(self):
+        with self.assertRaises(MachineConfigError):
+            MachineConfig(["I", "II", "III"], ["1", "1"], ["A", "A", "Z"], "B")
+
+        with self.assertRaises(RotorError):
+            MachineConfig(["I", "II", "X"], ["1", "1", "1"], ["A", "A", "Z"], "B")
+
+        config = MachineConfig(
+            ["I", "II", "III"], ["1", "1", "1"], ["A", "A", "Z"], "B"
+        )
+
+        with self.assertRaises(MachineConfigError):
+            encode_with_config(config, "hello")
+
+        with self.assertRaises(MachineConfigError):
+            encode_with_config(config, "HELLO", RotorState((0, 0)))